@@ -1,6 +1,116 @@
-from datetime import datetime, date
-from bson import ObjectId
+from datetime import datetime, date, timezone
+from email.utils import parsedate_to_datetime
 import httpx
+import logging
+
+from .utils.retry import retry_async, with_db_retry
+
+
+logger = logging.getLogger(__name__)
+
+WHATSAPP_DISPATCH_URL = "https://api.alumnx.com/api/communication/dispatchWhatsappByUserId"
+WHATSAPP_ERROR_TEXT_LIMIT = 512
+# Longest Retry-After we wait out inside the request; a longer one is left
+# to the next reminder cycle
+WHATSAPP_RETRY_AFTER_MAX = 10.0
+# Failures where the request never reached the server, so a retry can't
+# send the reminder twice
+WHATSAPP_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+# Shared client so reminders reuse pooled keep-alive connections instead of
+# paying a new TCP + TLS handshake per call. Created lazily, closed on app
+# shutdown via close_whatsapp_client().
+_whatsapp_client = None
+
+
+def _get_whatsapp_client() -> httpx.AsyncClient:
+    global _whatsapp_client
+    if _whatsapp_client is None or _whatsapp_client.is_closed:
+        _whatsapp_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+        )
+    return _whatsapp_client
+
+
+async def close_whatsapp_client():
+    """Close the shared WhatsApp HTTP client, if one was opened."""
+    global _whatsapp_client
+    if _whatsapp_client is not None:
+        await _whatsapp_client.aclose()
+        _whatsapp_client = None
+
+
+def _active_task_names_pipeline(user_id: str) -> list:
+    """
+    Aggregation on `assignments` that yields {"name": ...} for every active
+    task of the user, joined against `tasks` in assignment order.
+    """
+    return [
+        {"$match": {"userId": user_id}},
+        {"$unwind": "$tasks"},
+        {"$match": {"tasks.taskStatus": "active"}},
+        {"$addFields": {
+            "tid": {
+                "$convert": {
+                    "input": "$tasks.taskId",
+                    "to": "objectId",
+                    "onError": None,
+                    "onNull": None
+                }
+            }
+        }},
+        {"$lookup": {
+            "from": "tasks",
+            "localField": "tid",
+            "foreignField": "_id",
+            "as": "t",
+            "pipeline": [{"$project": {"name": 1, "title": 1}}]
+        }},
+        {"$unwind": "$t"},
+        {"$project": {
+            "_id": 0,
+            "name": {"$ifNull": ["$t.name", {"$ifNull": ["$t.title", "Unnamed Task"]}]}
+        }}
+    ]
+
+
+@with_db_retry
+async def _fetch_active_task_names(db, user_id: str) -> list:
+    """Names of the user's active tasks, in assignment order."""
+    docs = await db.assignments.aggregate(
+        _active_task_names_pipeline(user_id)
+    ).to_list(length=None)
+    return [doc["name"] for doc in docs]
+
+
+def _retry_after_seconds(response: httpx.Response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _is_retryable_response(response: httpx.Response) -> bool:
+    """
+    Only 429 is retried: the dispatch POST isn't idempotent, and a 5xx may
+    come after the message was already queued.
+    """
+    if response.status_code != 429:
+        return False
+    retry_after = _retry_after_seconds(response)
+    return retry_after is None or retry_after <= WHATSAPP_RETRY_AFTER_MAX
 
 
 async def check_and_send_task_reminders(db, user_id: str):
@@ -8,44 +118,14 @@ async def check_and_send_task_reminders(db, user_id: str):
     Get active tasks and send WhatsApp reminders.
     """
     try:
-        print(f"\n📅 Checking active tasks for user: {user_id}")
-        
-        # Get user's assignments
-        assignment = await db.assignments.find_one({"userId": user_id})
-        
-        if not assignment or not assignment.get("tasks"):
-            print("ℹ️ No tasks found for user")
-            return {
-                "status": "success",
-                "message": "No tasks assigned to user",
-                "reminders_sent": 0,
-                "tasks": []
-            }
-        
-        print(f"📋 Total tasks in assignment: {len(assignment.get('tasks', []))}")
-        
-        # Filter active tasks
-        active_tasks = []
-        
-        for idx, task_assignment in enumerate(assignment.get("tasks", [])):
-            task_status = task_assignment.get("taskStatus")
-            print(f"   Task {idx + 1}: taskStatus = '{task_status}' (type: {type(task_status)})")
-            
-            if task_status == "active":
-                # Get task details
-                task_id = task_assignment.get("taskId")
-                print(f"   Found active task with taskId: {task_id}")
-                task = await db.tasks.find_one({"_id": ObjectId(task_id)})
-                
-                if task:
-                    task_name = task.get("name", task.get("title", "Unnamed Task"))
-                    active_tasks.append(task_name)
-                    print(f"   ✅ Active task: {task_name}")
-                else:
-                    print(f"   ⚠️ Task document not found for taskId: {task_id}")
+        logger.debug("📅 Checking active tasks for user: %s", user_id)
         
+        # Resolve active task names in one server-side pass instead of one
+        # tasks.find_one per assignment entry
+        active_tasks = await _fetch_active_task_names(db, user_id)
+
         if not active_tasks:
-            print("ℹ️ No active tasks")
+            logger.debug("ℹ️ No active tasks for user: %s", user_id)
             return {
                 "status": "success",
                 "message": "No active tasks",
@@ -55,7 +135,7 @@ async def check_and_send_task_reminders(db, user_id: str):
         
         task_count = len(active_tasks)
         
-        print(f"\n📱 Sending WhatsApp reminder for {task_count} tasks")
+        logger.debug("📱 Sending WhatsApp reminder for %d tasks", task_count)
         
         # Call WhatsApp API - Only send 2 variables ({{2}} and {{3}})
         # {{1}} is automatically populated with userName in JavaScript
@@ -68,43 +148,46 @@ async def check_and_send_task_reminders(db, user_id: str):
             }
         }
         
-        print(f"📤 Payload: {whatsapp_payload}")
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.alumnx.com/api/communication/dispatchWhatsappByUserId",
+        # Retry only failures that can't have delivered the reminder: connect
+        # errors (jittered backoff) and 429 (waiting out Retry-After). 5xx and
+        # read timeouts may follow a queued send; the next cycle covers them.
+        client = _get_whatsapp_client()
+        response = await retry_async(
+            lambda: client.post(
+                WHATSAPP_DISPATCH_URL,
                 json=whatsapp_payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30.0
-            )
-            
-            response_text = await response.aread()
-            print(f"📥 Response status: {response.status_code}")
-            print(f"📥 Response body: {response_text.decode()}")
+                headers={"Content-Type": "application/json"}
+            ),
+            retry_on=WHATSAPP_RETRY_ERRORS,
+            retry_if=_is_retryable_response,
+            delay_for=_retry_after_seconds,
+        )
+        
+        logger.debug("📥 Response status: %s", response.status_code)
+        
+        if response.status_code == 200:
+            logger.info("✅ WhatsApp reminder sent to user: %s", user_id)
+            result = response.json()
+            return {
+                "status": "success",
+                "message": f"Reminder sent for {task_count} tasks",
+                "reminders_sent": task_count,
+                "tasks": active_tasks,
+                "whatsapp_response": result
+            }
+        else:
+            # Cap the body we keep so a huge error page can't bloat the log/response
+            error_text = response.text[:WHATSAPP_ERROR_TEXT_LIMIT]
+            logger.error("❌ WhatsApp API error %s: %s", response.status_code, error_text)
+            return {
+                "status": "error",
+                "message": f"WhatsApp API error: {response.status_code} - {error_text}",
+                "reminders_sent": 0,
+                "tasks": active_tasks
+            }
             
-            if response.status_code == 200:
-                print("✅ WhatsApp reminder sent successfully")
-                result = response.json()
-                return {
-                    "status": "success",
-                    "message": f"Reminder sent for {task_count} tasks",
-                    "reminders_sent": task_count,
-                    "tasks": active_tasks,
-                    "whatsapp_response": result
-                }
-            else:
-                print(f"❌ WhatsApp API error: {response.status_code}")
-                return {
-                    "status": "error",
-                    "message": f"WhatsApp API error: {response.status_code} - {response_text.decode()}",
-                    "reminders_sent": 0,
-                    "tasks": active_tasks
-                }
-                
     except Exception as e:
-        print(f"❌ Error in task reminder check: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error in task reminder check: %s", e)
         return {
             "status": "error",
             "message": str(e),
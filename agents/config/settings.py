@@ -15,6 +15,15 @@ class Config:
     
     # Agent Configuration
     DEFAULT_AGENT_NAME = "Study Buddy"
+    # Max LangGraph steps per ReAct run (each tool round is two steps);
+    # stops a looping agent from burning tool calls and tokens
+    AGENT_RECURSION_LIMIT = int(os.getenv("AGENT_RECURSION_LIMIT", "20"))
+    # Task descriptions are cut to this length in tool output and the task
+    # selection prompt fed to the LLM
+    TOOL_DESCRIPTION_MAX_CHARS = 200
+    # Unassigned tasks per assigned project (in title order) offered to the
+    # task selection prompt
+    TASK_CANDIDATES_PER_PROJECT = int(os.getenv("TASK_CANDIDATES_PER_PROJECT", "10"))
     
     # Paths - updated to point to the correct location
     PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "prompts")
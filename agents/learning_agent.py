@@ -1,53 +1,248 @@
 # learning_agent.py
 
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langgraph.errors import GraphRecursionError
 from langgraph.prebuilt import create_react_agent
 from langsmith import traceable
+from bson import ObjectId
+from pymongo import InsertOne
 from datetime import datetime, timedelta
-import json
+from functools import lru_cache
+import asyncio
+import logging
 import re
 
+import orjson
+
 from .config.settings import Config
 from .prompts.loader import PromptLoader
-from .utils.intent_classifier import classify_user_intent
-from .utils.response_parser import parse_json_from_response, parse_llm_content
-from .utils.task_validator import validate_and_enrich_tasks, format_tasks_message
+from .utils.intent_classifier import classify_user_intent, normalize_intent
+from .utils.response_parser import find_json_block, parse_json_from_response, parse_llm_content
+from .utils.task_validator import (
+    validate_and_enrich_tasks, format_tasks_message, start_task_universe, fetch_candidate_tasks,
+)
 from .utils.tools import create_agent_tools
-from .utils.agent_name_handler import handle_agent_name_update
+from .utils.agent_name_handler import handle_agent_name_update, remember_agent_name
 from .utils.callback_handler import handle_button_callback, is_button_callback
-from .utils.study_buddy_helper import get_user_learning_state, update_buddy_status
+from .utils.study_buddy_helper import get_user_learning_state, update_buddy_status, start_assignment_snapshot
+from .utils.chat_window import trim_chats_to_budget
+from .utils.user_profile import summarize_profile
+from .utils.response_cache import ResponseCache, make_cache_key, normalize_text
+
+
+logger = logging.getLogger(__name__)
+
+# First message a new user receives; a name reply can only follow this
+WELCOME_MESSAGE = "Hello! I am Study Buddy, your AI assistant from Alumnx AI Labs. Looks like we meet for the first time. Please give me a new name to get going."
+
+# Reply when the ReAct agent hits Config.AGENT_RECURSION_LIMIT
+AGENT_STEP_LIMIT_MESSAGE = "Sorry, I couldn't finish working that out just now. Could you try asking again, maybe in a simpler way?"
+
+# Name replies are short; anything longer or phrased as a question is not one
+NAME_RESPONSE_MAX_WORDS = 4
+
+# Token budgets for the chat context pasted into classification / buddy prompts
+NAME_CHECK_CONTEXT_TOKENS = 512
+BUDDY_CONTEXT_TOKENS = 1024
+
+# Greetings that come in right after the welcome message; answered without
+# asking the LLM whether they are a name
+NAME_CHECK_GREETINGS = frozenset({
+    "hi", "hii", "hello", "hey", "hey there", "hello there", "sup", "yo",
+    "hola", "good morning", "good afternoon", "good evening",
+})
+
+# Short acknowledgements that are never names; left to the intent classifier
+NOT_A_NAME = frozenset({"ok", "okay", "yes", "no", "thanks", "thank you", "bye"})
+
+# Digits, or a period anywhere but the end, rule out a name reply
+_NOT_NAME_CHARS_RE = re.compile(r'\d|\.(?!\s*$)')
+
+# Structured name-check results, so repeated inputs (e.g. "hi" after the
+# welcome message) skip the LLM call
+_name_check_cache = ResponseCache(maxsize=1024, ttl=3600)
+
+# Appended to the agent prompt while no profile/resume is stored; the agent
+# fills in save_user_profile's arguments itself, in the same turn
+PROFILE_CAPTURE_NOTE = "\n\nNote: No profile or resume is stored for this user yet. If the message describes the user (background, interests, career goals, skills), call save_user_profile once with what they shared before responding."
+
+# Metadata tags the agent appends to its replies
+_RESP_TYPE_RE = re.compile(r'\[RESPONSE_TYPE:\s*(\w+)\]', re.IGNORECASE)
+_NEXT_CONTACT_RE = re.compile(r'\[NEXT_CONTACT: (.*?)\]')
+_DAYS_RE = re.compile(r'\[DAYS: (\d+)\]')
+_TAG_CLEANUP_RE = re.compile(r'\[(?:SCENARIO|NEXT_CONTACT|DAYS|RESPONSE_TYPE):.*?\]')
+
+# Non-ISO layouts the LLM sometimes uses in [NEXT_CONTACT: ...]
+NEXT_CONTACT_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+# dateutil.parser, loaded by _get_date_parser() on the first fallback
+_date_parser = None
+
+# Tools whose use means the user's active tasks may have changed
+_TASK_REFRESH_TOOLS = frozenset({"assign_task_to_user_tool", "get_first_task_by_skill"})
+
+# Prompt templates are read from disk once and kept in the loader's cache
+_prompt_loader = PromptLoader(Config.PROMPTS_DIR)
+
+# Compiled ReAct agents, keyed by (id(db), id(llm)); the graph holds no
+# per-request state so it is safe to share between invocations
+_react_agents = {}
+
+
+@lru_cache(maxsize=4)
+def _get_llm(model: str, temperature: float) -> ChatGoogleGenerativeAI:
+    """Return a process-wide LLM client for the given model settings."""
+    return ChatGoogleGenerativeAI(model=model, temperature=temperature)
+
+
+@lru_cache(maxsize=128)
+def _system_prompt(template_name: str, agent_name: str) -> str:
+    """Formatted system prompt for templates that only take agent_name."""
+    return _prompt_loader.format(template_name, agent_name=agent_name)
+
+
+def _get_react_agent(db, llm):
+    """Return the compiled ReAct agent for this database, building it once."""
+    key = (id(db), id(llm))
+    agent = _react_agents.get(key)
+    if agent is None:
+        agent = create_react_agent(llm, create_agent_tools(db))
+        _react_agents[key] = agent
+    return agent
+
+
+class SimpleLearningAgent:
+    def __init__(self, database):
+        self.db = database
+
+    async def ainvoke(self, user_id: str, message: str = None, resume_data: dict = None):
+        """Invoke the agent for a specific user."""
+        return await run_learning_agent(self.db, user_id, message, resume_data)
 
 
 def get_learning_agent(db):
     """
     Initialize and return the learning agent.
     This function exists for compatibility with your existing code.
+    Also builds the LLM client and compiles the ReAct graph up front so the
+    first request doesn't pay for it.
     """
-    print("✅ Learning agent initialized")
+    if Config.GOOGLE_API_KEY:
+        try:
+            _get_react_agent(db, _get_llm(Config.LLM_MODEL, Config.LLM_TEMPERATURE))
+        except Exception as e:
+            logger.warning("⚠️ Could not prebuild the ReAct agent: %s", e)
+
+    logger.info("✅ Learning agent initialized")
+    return SimpleLearningAgent(db)
 
-    class SimpleLearningAgent:
-        def __init__(self, database):
-            self.db = database
 
-        async def ainvoke(self, user_id: str, message: str = None, resume_data: dict = None):
-            """Invoke the agent for a specific user."""
-            return await run_learning_agent(self.db, user_id, message, resume_data)
+def _get_date_parser():
+    """dateutil's parser, imported on first use; the fast path rarely needs it."""
+    global _date_parser
+    if _date_parser is None:
+        from dateutil import parser
+        _date_parser = parser
+    return _date_parser
 
-    return SimpleLearningAgent(db)
+
+def _parse_next_contact(text: str) -> datetime:
+    """
+    Parse the [NEXT_CONTACT: ...] timestamp. The prompt asks for ISO format,
+    so try the stdlib parsers first and only fall back to dateutil's much
+    slower free-form parser.
+    """
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in NEXT_CONTACT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return _get_date_parser().parse(text)
+
+
+def _to_pretty_json(data) -> str:
+    """Indented JSON for pasting user/resume data into a prompt."""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _format_candidate_tasks(candidates: list) -> str:
+    """Candidate tasks grouped by project, one line per task, for the task selection prompt."""
+    max_chars = Config.TOOL_DESCRIPTION_MAX_CHARS
+    lines = []
+    project_name = None
+    for task in candidates:
+        if task["project_name"] != project_name:
+            project_name = task["project_name"]
+            lines.append(f"Project: {project_name}")
+        description = task["description"]
+        if len(description) > max_chars:
+            description = description[:max_chars].rstrip() + "..."
+        lines.append(f"- ID: {task['id']} | Title: {task['title']} | Description: {description or 'No description'}")
+    return "\n".join(lines)
+
+
+def looks_like_name(user_message: str) -> bool:
+    """
+    Whether the message is shaped like a name reply: short text without
+    question marks, digits or sentence breaks that isn't a plain "ok"/"yes".
+    """
+    text = user_message.strip()
+    if "?" in text or len(text.split()) > NAME_RESPONSE_MAX_WORDS:
+        return False
+    if _NOT_NAME_CHARS_RE.search(text):
+        return False
+    return normalize_text(text) not in NOT_A_NAME
+
+
+def could_be_name_response(user_message: str, chat_history: list) -> bool:
+    """
+    Cheap pre-check for check_if_name_response.
+    A name reply is only possible while the welcome prompt is still in the
+    recent context the LLM would see, and only if looks_like_name().
+    """
+    recent = chat_history[-5:]
+    if not any(chat and chat.get("message") == WELCOME_MESSAGE for chat in recent):
+        return False
+    return looks_like_name(user_message)
 
 
 async def check_if_name_response(llm, user_message: str, chat_history: list) -> dict:
     """
     Check if the user's message is a name in response to the initial greeting.
-    Returns dict with 'is_name' (bool) and 'extracted_name' (str)
+    When the LLM is consulted it also classifies the message intent, so the
+    caller can skip the separate classify_user_intent call.
+    Returns dict with 'is_name' (bool), 'extracted_name' (str) and
+    'intent' (str, or None if no classification was made)
     """
+    # Skip the LLM round-trip on the vast majority of turns
+    if not could_be_name_response(user_message, chat_history):
+        return {'is_name': False, 'extracted_name': '', 'intent': None}
+
+    if normalize_text(user_message) in NAME_CHECK_GREETINGS:
+        return {'is_name': False, 'extracted_name': '', 'intent': 'general_conversation'}
+
     try:
         # Get last few messages to understand context
+        recent_chats = trim_chats_to_budget(
+            [chat for chat in chat_history[-5:] if chat], NAME_CHECK_CONTEXT_TOKENS
+        )
         recent_context = "\n".join([
             f"{chat['userType']}: {chat['message']}" 
-            for chat in chat_history[-5:] if chat
+            for chat in recent_chats
         ])
+
+        cache_key = make_cache_key(
+            Config.LLM_MODEL, "name_check", normalize_text(user_message), recent_context
+        )
+        cached = _name_check_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         prompt = f"""Analyze if the user's message is providing a name in response to being asked to give the AI assistant a new name.
 
@@ -57,34 +252,40 @@ Recent conversation:
 User's latest message: "{user_message}"
 
 If the user is providing a name (could be a single word, multiple words, or a creative name), respond with:
-{{"is_name": true, "name": "<extracted_name>"}}
+{{"is_name": true, "name": "<extracted_name>", "intent": "general_conversation"}}
 
 IMPORTANT: Greetings like "hi", "hello", "hey", "sup", "yo" are NOT names. General questions are NOT names.
 
 If the user is asking a question, greeting you, or having a general conversation (not providing a name), respond with:
-{{"is_name": false, "name": ""}}
+{{"is_name": false, "name": "", "intent": "<intent>"}}
+
+where <intent> is one of:
+- "task_assignment": the user updated their goals and wants task recommendations
+- "buddy_response": the user picks a skill (e.g. "Frontend"), asks for the next task, says they are busy or wants to be contacted later
+- "general_conversation": anything else, e.g. career or learning questions
 
 Respond ONLY with the JSON object, nothing else."""
 
         result = await llm.ainvoke([HumanMessage(content=prompt)])
         response = parse_llm_content(result.content).strip()
         
-        # Parse JSON response
-        
         # Extract JSON from response
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            parsed = json.loads(json_match.group(0))
-            return {
+        json_str = find_json_block(response)
+        if json_str:
+            parsed = orjson.loads(json_str)
+            name_check = {
                 'is_name': parsed.get('is_name', False),
-                'extracted_name': parsed.get('name', '').strip()
+                'extracted_name': parsed.get('name', '').strip(),
+                'intent': normalize_intent(parsed['intent']) if parsed.get('intent') else None
             }
+            _name_check_cache.set(cache_key, name_check)
+            return name_check
         
-        return {'is_name': False, 'extracted_name': ''}
+        return {'is_name': False, 'extracted_name': '', 'intent': None}
         
     except Exception as e:
-        print(f"⚠️ Error checking if name response: {str(e)}")
-        return {'is_name': False, 'extracted_name': ''}
+        logger.warning("⚠️ Error checking if name response: %s", e)
+        return {'is_name': False, 'extracted_name': '', 'intent': None}
 
 
 async def save_resume_data_directly(db, user_id: str, resume_data: dict) -> bool:
@@ -101,27 +302,19 @@ async def save_resume_data_directly(db, user_id: str, resume_data: dict) -> bool
         bool: True if saved successfully, False otherwise
     """
     try:
-        print(f"\n{'='*60}")
-        print(f"📄 SAVING RESUME DATA")
-        print(f"{'='*60}")
-        print(f"User ID: {user_id}")
-        print(f"Resume data keys: {list(resume_data.keys())}")
-        
-        # Create userdata document
-        userdata_doc = {
-            "userId": user_id,
-            "resumeData": resume_data,
-            "uploadedAt": datetime.now(),
-            "lastUpdated": datetime.now()
-        }
+        logger.debug("📄 Saving resume data for user %s (keys: %s)", user_id, resume_data.keys())
         
         # Upsert: update if exists, insert if doesn't
+        # (lastUpdated is stamped by the server)
         result = await db.userdata.update_one(
             {"userId": user_id},
             {
                 "$set": {
                     "resumeData": resume_data,
-                    "lastUpdated": datetime.now()
+                    "profileDigest": summarize_profile(resume_data)
+                },
+                "$currentDate": {
+                    "lastUpdated": True
                 },
                 "$setOnInsert": {
                     "uploadedAt": datetime.now()
@@ -131,104 +324,16 @@ async def save_resume_data_directly(db, user_id: str, resume_data: dict) -> bool
         )
         
         if result.upserted_id:
-            print(f"✅ New resume data inserted with ID: {result.upserted_id}")
+            logger.info("✅ New resume data inserted with ID: %s", result.upserted_id)
         elif result.modified_count > 0:
-            print(f"✅ Existing resume data updated")
+            logger.info("✅ Existing resume data updated for user: %s", user_id)
         else:
-            print(f"⚠️ No changes made to resume data (data unchanged)")
+            logger.debug("⚠️ No changes made to resume data (data unchanged)")
         
-        print(f"{'='*60}\n")
         return True
         
     except Exception as e:
-        print(f"❌ Error saving resume data: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
-
-
-async def extract_and_save_user_info(db, llm, user_id: str, user_text: str) -> bool:
-    """
-    Extract structured information from user's text and save to userdata.
-    
-    Args:
-        db: Database connection
-        llm: LLM instance
-        user_id: User's ID
-        user_text: User's description about themselves
-        
-    Returns:
-        bool: True if extracted and saved successfully
-    """
-    try:
-        print(f"\n{'='*60}")
-        print(f"📝 EXTRACTING USER INFO FROM TEXT")
-        print(f"{'='*60}")
-        print(f"User ID: {user_id}")
-        print(f"Text length: {len(user_text)} chars")
-        
-        # Use LLM to extract structured data
-        extraction_prompt = f"""Extract structured information from the following user description.
-
-User's message: "{user_text}"
-
-Extract and return ONLY a JSON object with these fields (use "Not provided" if information is missing):
-- about: Brief summary of the person
-- interests: What excites them or what they're interested in
-- careerGoals: Their career aspirations and goals
-- currentRole: Their current job/role if mentioned
-- skills: Any skills they mentioned
-- experience: Years of experience or background mentioned
-
-Return ONLY the JSON object, nothing else."""
-
-        result = await llm.ainvoke([HumanMessage(content=extraction_prompt)])
-        response = parse_llm_content(result.content).strip()
-        
-        print(f"LLM response:\n{response}\n")
-        
-        # Extract JSON from response
-        import re
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            extracted_data = json.loads(json_match.group(0))
-            print(f"✅ Extracted data: {list(extracted_data.keys())}")
-            
-            # Save to userdata collection
-            userdata_doc = {
-                "userId": user_id,
-                "resumeData": extracted_data,
-                "uploadedAt": datetime.now(),
-                "lastUpdated": datetime.now(),
-                "dataSource": "text_input"
-            }
-            
-            result = await db.userdata.update_one(
-                {"userId": user_id},
-                {
-                    "$set": {
-                        "resumeData": extracted_data,
-                        "lastUpdated": datetime.now(),
-                        "dataSource": "text_input"
-                    },
-                    "$setOnInsert": {
-                        "uploadedAt": datetime.now()
-                    }
-                },
-                upsert=True
-            )
-            
-            print(f"✅ User info saved to userdata collection")
-            print(f"{'='*60}\n")
-            return True
-        else:
-            print(f"⚠️ Could not extract JSON from LLM response")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error extracting user info: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error saving resume data: %s", e)
         return False
 
 
@@ -243,8 +348,7 @@ def extract_response_type_and_buttons(response_text: str) -> tuple:
         tuple: (cleaned_response, buttons_list)
     """
     # Look for [RESPONSE_TYPE: ...] tag
-    pattern = r'\[RESPONSE_TYPE:\s*(\w+)\]'
-    match = re.search(pattern, response_text, re.IGNORECASE)
+    match = _RESP_TYPE_RE.search(response_text)
     
     buttons = []
     cleaned_response = response_text
@@ -252,9 +356,9 @@ def extract_response_type_and_buttons(response_text: str) -> tuple:
     if match:
         response_type = match.group(1).lower()
         # Remove the tag from the response
-        cleaned_response = re.sub(pattern, '', response_text, flags=re.IGNORECASE).strip()
+        cleaned_response = _RESP_TYPE_RE.sub('', response_text).strip()
         
-        print(f"📌 Detected response type: {response_type}")
+        logger.debug("📌 Detected response type: %s", response_type)
         
         if response_type == "show_program_buttons":
             # User is aligned - show program buttons
@@ -263,17 +367,17 @@ def extract_response_type_and_buttons(response_text: str) -> tuple:
                 {"name": "#1 + 1 on 1 Placement Support", "callback": "ps"},
                 {"name": "Job Support", "callback": "js"}
             ]
-            print(f"✅ Adding {len(buttons)} program buttons")
+            logger.debug("✅ Adding %d program buttons", len(buttons))
         elif response_type == "not_aligned":
             # User is not aligned - no buttons
-            print(f"⚠️ User not aligned with Alumnx focus - no buttons")
+            logger.debug("⚠️ User not aligned with Alumnx focus - no buttons")
         else:
-            print(f"⚠️ Unknown response type: {response_type}")
+            logger.warning("⚠️ Unknown response type: %s", response_type)
     else:
-        print(f"ℹ️ No response type tag found in agent response")
+        logger.debug("ℹ️ No response type tag found in agent response")
     
     # Global cleanup for any other tags (SCENARIO, NEXT_CONTACT, DAYS, RESPONSE_TYPE, etc.)
-    cleaned_response = re.sub(r'\[(?:SCENARIO|NEXT_CONTACT|DAYS|RESPONSE_TYPE):.*?\]', '', cleaned_response).strip()
+    cleaned_response = _TAG_CLEANUP_RE.sub('', cleaned_response).strip()
     
     return cleaned_response, buttons
 
@@ -297,49 +401,62 @@ async def run_learning_agent(
     Returns:
         dict: Response with message, status, tasks, buttons, etc.
     """
+    # Background tasks started below; settled in the finally so none
+    # outlives the request or drops its exception
+    insert_task = None
+    intent_task = None
     try:
-        print(f"\n{'='*60}")
-        print(f"🚀 Starting learning agent for user: {user_id}")
-        print(f"📝 User message: {user_message}")
-        print(f"📄 Resume data: {'Yes' if resume_data else 'No'}")
-        print(f"{'='*60}\n")
+        logger.info(
+            "🚀 Starting learning agent for user: %s (resume data: %s)",
+            user_id, "Yes" if resume_data else "No"
+        )
+        logger.debug("📝 User message: %s", user_message)
 
         # Validate configuration
         Config.validate()
 
         # Initialize LLM early for name detection
-        llm = ChatGoogleGenerativeAI(
-            model=Config.LLM_MODEL,
-            temperature=Config.LLM_TEMPERATURE,
-        )
+        llm = _get_llm(Config.LLM_MODEL, Config.LLM_TEMPERATURE)
 
         # ============================================================
         # STEP 0: Handle Resume Data if Present
         # ============================================================
         if resume_data:
-            print(f"\n📄 RESUME DATA DETECTED - Saving to database")
+            logger.debug("📄 Resume data detected - saving to database")
             save_success = await save_resume_data_directly(db, user_id, resume_data)
             
             if save_success:
-                print(f"✅ Resume data saved successfully")
+                logger.debug("✅ Resume data saved successfully")
                 # Update the message to inform the agent
                 if not user_message or user_message == "User uploaded the resume.":
                     user_message = "User uploaded the resume."
             else:
-                print(f"⚠️ Failed to save resume data")
+                logger.warning("⚠️ Failed to save resume data for user: %s", user_id)
                 if not user_message or user_message == "User uploaded the resume.":
                     user_message = "User tried to upload resume but there was an error saving it."
 
         # ============================================================
         # STEP 1: Check if userId exists in chat collection
         # ============================================================
-        existing_chat = await db.chats.find_one({"userId": user_id})
+        # The learning state and agent doc only depend on user_id, so fetch
+        # them alongside the existence check instead of one after another.
+        # The assignment read for the learning state is reused by the task
+        # tools and the post-run validation.
+        start_assignment_snapshot(user_id)
+        existing_chat, learning_state = await asyncio.gather(
+            db.chats.find_one({"userId": user_id}, {"_id": 1}),
+            get_user_learning_state(db, user_id),
+        )
+        # The learning state already read the agents doc; keep the name
+        # cache in step with it rather than reading the doc twice
+        stored_agent_name = learning_state["agent_name"]
+        remember_agent_name(user_id, stored_agent_name)
         
         if not existing_chat:
-            print("🆕 New user - no chat history found")
+            logger.info("🆕 New user - no chat history found")
             
             # Insert initial welcome message
-            welcome_message = "Hello! I am Study Buddy, your AI assistant from Alumnx AI Labs. Looks like we meet for the first time. Please give me a new name to get going."
+            welcome_message = WELCOME_MESSAGE
             
             chat_doc = {
                 "userId": user_id,
@@ -349,7 +466,7 @@ async def run_learning_agent(
             }
             
             await db.chats.insert_one(chat_doc)
-            print(f"✅ Welcome message saved to chat collection")
+            logger.debug("✅ Welcome message saved to chat collection")
             
             return {
                 "message": welcome_message,
@@ -360,11 +477,8 @@ async def run_learning_agent(
         # ============================================================
         # STEP 1.2: Check for Proactive Study Buddy Nudge
         # ============================================================
-        learning_state = await get_user_learning_state(db, user_id)
-        
         # Get agent name for personalized responses
-        agent_doc = await db.agents.find_one({"userId": user_id})
-        agent_name = agent_doc.get("agentName", Config.DEFAULT_AGENT_NAME) if agent_doc else Config.DEFAULT_AGENT_NAME
+        agent_name = stored_agent_name or Config.DEFAULT_AGENT_NAME
         
         # 🚨 FIX: If the stored agent name is "Frontend" (accidental assignment), fallback to "Study Buddy"
         if agent_name == "Frontend":
@@ -377,12 +491,12 @@ async def run_learning_agent(
             buddy_status = learning_state.get("buddy_status", "active")
 
             if buddy_status == "postponed" and next_contact and next_contact > current_time:
-                print(f"🤫 Skipping proactive nudge: User is postponed until {next_contact}")
+                logger.info("🤫 Skipping proactive nudge: User is postponed until %s", next_contact)
                 return {"message": "", "status": "skip", "skip_save": True} # Return skip status
 
             # Case 1: Preferences set but no active tasks
             if not learning_state["has_active_tasks"] and learning_state["has_preferences"]:
-                print("💡 Proactive Nudge: User has preferences but 0 active tasks")
+                logger.debug("💡 Proactive Nudge: User has preferences but 0 active tasks")
                 prefs_list = ", ".join(learning_state["preferences"])
                 nudge_message = f"Hello! I am {agent_name}. Here are your preferences: {prefs_list}. Looks like there are no active task in your active task tab. What would you like to focus on today?"
                 
@@ -391,7 +505,7 @@ async def run_learning_agent(
             
             # Case 2: Active tasks already exist
             elif learning_state["has_active_tasks"]:
-                print("💡 Proactive Reminder: User has active tasks")
+                logger.debug("💡 Proactive Reminder: User has active tasks")
                 nudge_message = f"Hello! I am {agent_name}. I see there are active tasks in your bucket, please complete it to move forward with your learning journey!"
                 
                 # Let the router handle saving this message
@@ -406,7 +520,7 @@ async def run_learning_agent(
         # STEP 1.5: Handle Button Callbacks FIRST (sfs, ps, js)
         # ============================================================
         if user_message and is_button_callback(user_message):
-            print(f"🔘 Button callback detected: {user_message}")
+            logger.debug("🔘 Button callback detected: %s", user_message)
             callback_response = handle_button_callback(user_message)
             
             if callback_response:
@@ -417,7 +531,6 @@ async def run_learning_agent(
                     "message": user_message,
                     "timestamp": datetime.now()
                 }
-                await db.chats.insert_one(user_chat_doc)
                 
                 # Save callback response to chat
                 agent_chat_doc = {
@@ -426,8 +539,12 @@ async def run_learning_agent(
                     "message": callback_response["message"],
                     "timestamp": datetime.now()
                 }
-                await db.chats.insert_one(agent_chat_doc)
-                print(f"✅ Callback response saved to chat")
+                # Both messages go to chats in a single round-trip
+                await db.chats.bulk_write([
+                    InsertOne(user_chat_doc),
+                    InsertOne(agent_chat_doc),
+                ])
+                logger.debug("✅ Callback response saved to chat")
                 
                 # Return callback response with skip_save flag
                 return {
@@ -438,34 +555,71 @@ async def run_learning_agent(
         # ============================================================
         # STEP 2: Save user's incoming message
         # ============================================================
+        # Saved first so a failure later in the turn can't lose it; the
+        # write runs while the history is read below
+        user_chat_doc = None
         if user_message:
-            print(f"💾 Saving user message to chat history")
             user_chat_doc = {
+                "_id": ObjectId(),
                 "userId": user_id,
                 "userType": "user",
                 "message": user_message,
                 "timestamp": datetime.now()
             }
-            await db.chats.insert_one(user_chat_doc)
-            print(f"✅ User message saved")
+            logger.debug("💾 Saving user message to chat history")
+            insert_task = asyncio.create_task(db.chats.insert_one(user_chat_doc))
+        
+        # The intent depends only on the message. When it can't be a name
+        # reply (so STEP 4 won't classify it), classify it while the
+        # history below is read instead of after.
+        if user_message and not looks_like_name(user_message):
+            intent_task = asyncio.create_task(
+                classify_user_intent(llm, user_message, _prompt_loader)
+            )
         
         # ============================================================
         # STEP 3: User exists - get last 20 chat messages
         # ============================================================
-        print("📚 Existing user - fetching chat history")
-        chat_history_cursor = db.chats.find(
-            {"userId": user_id}
-        ).sort("timestamp", -1).limit(20)
+        logger.debug("📚 Existing user - fetching chat history")
+        # Leave room for the incoming message, which is appended below
+        # (its insert may or may not have landed yet, so it is excluded here)
+        history_limit = 19 if user_chat_doc else 20
+        history_match = {"userId": user_id}
+        if user_chat_doc:
+            history_match["_id"] = {"$ne": user_chat_doc["_id"]}
+
+        # Take the newest messages and re-sort them ascending on the server
+        # so the history already arrives in chronological order, keeping
+        # only the fields the prompts use
+        # (the planner picks the chats {userId, timestamp} index, see
+        # main.DB_INDEXES; no hint, as a missing index would fail the query)
+        chat_history_cursor = db.chats.aggregate(
+            [
+                {"$match": history_match},
+                {"$sort": {"timestamp": -1}},
+                {"$limit": history_limit},
+                {"$sort": {"timestamp": 1}},
+                {"$project": {"_id": 0, "userType": 1, "message": 1, "timestamp": 1}},
+            ]
+        )
         
-        chat_history = await chat_history_cursor.to_list(length=20)
-        chat_history.reverse()  # Reverse to get chronological order
+        # userdata is needed in STEP 5.5; read it together with the history
+        chat_history, existing_userdata = await asyncio.gather(
+            chat_history_cursor.to_list(length=history_limit),
+            db.userdata.find_one(
+                {"userId": user_id}, {"resumeData": 1, "dataSource": 1, "profileDigest": 1}
+            ),
+        )
+
+        if user_chat_doc:
+            chat_history.append(user_chat_doc)
         
-        print(f"📜 Retrieved {len(chat_history)} chat messages")
+        logger.debug("📜 Retrieved %d chat messages", len(chat_history))
         
         # ============================================================
         # STEP 4: Check if user is providing a name
         # ============================================================
-        name_check = {'is_name': False, 'extracted_name': ''}
+        name_check = {'is_name': False, 'extracted_name': '', 'intent': None}
         
         # Only check for name if user actually sent a message
         if user_message and len(user_message.strip()) > 1:
@@ -473,23 +627,7 @@ async def run_learning_agent(
         
         if name_check['is_name'] and name_check['extracted_name']:
             agent_name = name_check['extracted_name']
-            print(f"🎯 Detected name response: {agent_name}")
-            
-            # Save agent name to agents collection
-            await db.agents.update_one(
-                {"userId": user_id},
-                {
-                    "$set": {
-                        "agentName": agent_name,
-                        "updated_at": datetime.now()
-                    },
-                    "$setOnInsert": {
-                        "created_at": datetime.now()
-                    }
-                },
-                upsert=True
-            )
-            print(f"✅ Saved agent name: {agent_name}")
+            logger.info("🎯 Detected name response: %s", agent_name)
             
             # Create greeting asking for user info or resume
             greeting = f"{agent_name} at your service!\n\nPlease tell me something about yourself, what excites you, your career goals or just attach your Resume here and Submit, so that I can get to know you better."
@@ -501,8 +639,27 @@ async def run_learning_agent(
                 "message": greeting,
                 "timestamp": datetime.now()
             }
-            await db.chats.insert_one(chat_doc)
-            print(f"✅ Greeting saved to chat collection")
+            
+            # Save agent name to agents collection and the greeting to chats,
+            # concurrently - the two collections are independent
+            await asyncio.gather(
+                db.agents.update_one(
+                    {"userId": user_id},
+                    {
+                        "$set": {
+                            "agentName": agent_name,
+                            "updated_at": datetime.now()
+                        },
+                        "$setOnInsert": {
+                            "created_at": datetime.now()
+                        }
+                    },
+                    upsert=True
+                ),
+                db.chats.insert_one(chat_doc),
+            )
+            remember_agent_name(user_id, agent_name)
+            logger.debug("✅ Saved agent name and greeting for user: %s", user_id)
             
             return {
                 "message": greeting,
@@ -514,49 +671,33 @@ async def run_learning_agent(
         # ============================================================
         # STEP 5: Normal conversation flow - not a name
         # ============================================================
-        print("💬 Regular conversation - proceeding with normal flow")
+        logger.debug("💬 Regular conversation - proceeding with normal flow")
         
         # ============================================================
-        # STEP 5.5: Check if user is providing info about themselves
+        # STEP 5.5: Check if user may be providing info about themselves
         # ============================================================
         # Check if user has already provided their info/resume
-        existing_userdata = await db.userdata.find_one({"userId": user_id})
-        
-        if not existing_userdata and user_message and not resume_data:
-            # User hasn't provided info yet, and they're sending text (not resume)
-            # Extract and save their information
-            print(f"📝 User providing information about themselves")
-            
-            extraction_success = await extract_and_save_user_info(
-                db, llm, user_id, user_message
-            )
-            
-            if extraction_success:
-                print(f"✅ User info extracted and saved")
-                # Set a flag so we know to proceed with goal alignment
-                user_message = f"User provided information about themselves: {user_message}"
-            else:
-                print(f"⚠️ Could not extract user info, proceeding normally")
+        # (existing_userdata was fetched alongside the chat history in STEP 3).
+        # If not, the agent saves it via the save_user_profile tool during its
+        # own turn rather than through a separate extraction call here.
+        needs_profile = not existing_userdata and bool(user_message) and not resume_data
         
-        # Initialize prompt loader
-        prompt_loader = PromptLoader(Config.PROMPTS_DIR)
-
         # agent_name is already defined above in STEP 1.2
-        print(f"🤖 Agent name: {agent_name}")
-
-        # Create tools
-        tools = create_agent_tools(db)
+        logger.debug("🤖 Agent name: %s", agent_name)
 
         # Classify user intent
         is_task_assignment_mode = False
         intent = "general_conversation" # Default intent
         
         if user_message:
-            intent = await classify_user_intent(llm, user_message, prompt_loader)
+            # Reuse the intent from the name check when it already ran the LLM
+            intent = name_check['intent'] or await (
+                intent_task or classify_user_intent(llm, user_message, _prompt_loader)
+            )
             is_task_assignment_mode = intent == "task_assignment"
         else:
             # Fallback for null message when no proactive nudge was triggered
-            print("ℹ️ Message is null and no nudge triggered. Using default greeting.")
+            logger.debug("ℹ️ Message is null and no nudge triggered. Using default greeting.")
             fallback_message = f"Hello! I am {agent_name}, your learning coach. I see there are no active tasks or specific suggestions right now. Would you like to discuss your career goals or set new preferences?"
             return {
                 "message": fallback_message,
@@ -564,24 +705,38 @@ async def run_learning_agent(
                 "skip_save": False
             }
 
-        print(f"🎯 Mode: {'TASK ASSIGNMENT' if is_task_assignment_mode else 'GENERAL CONVERSATION'}\n")
+        logger.info("🎯 Mode: %s", "TASK ASSIGNMENT" if is_task_assignment_mode else "GENERAL CONVERSATION")
 
         # Load appropriate prompts
         if is_task_assignment_mode:
-            system_prompt = prompt_loader.format("task_assignment_system", agent_name=agent_name)
-            user_prompt = prompt_loader.format("task_assignment_user", user_id=user_id)
+            # The workflow is fixed (goals -> assigned projects -> tasks), so
+            # read it directly and rank with a single LLM call instead of a
+            # ReAct loop. The reads are recorded for validation to reuse.
+            start_task_universe(user_id)
+            user_doc, candidate_tasks = await asyncio.gather(
+                db.users.find_one({"userId": user_id}, {"goals": 1}),
+                fetch_candidate_tasks(db, user_id),
+            )
+            system_prompt = _system_prompt("task_selection_system", agent_name)
+            user_prompt = _prompt_loader.format(
+                "task_selection_user",
+                user_id=user_id,
+                goals=(user_doc or {}).get("goals") or "No learning goals set yet.",
+                candidate_tasks=_format_candidate_tasks(candidate_tasks) or "None",
+            )
         elif intent == "buddy_response":
-            # Fetch context for buddy response
-            learning_state = await get_user_learning_state(db, user_id)
+            # Context for the buddy response comes from the learning state
+            # read in STEP 1; nothing in this turn has changed it since
             
             # Format last 5 messages for context
             context_messages = chat_history[-6:-1] if len(chat_history) > 1 else []
+            context_messages = trim_chats_to_budget(context_messages, BUDDY_CONTEXT_TOKENS)
             history_transcript = "\n".join([
                 f"{'User' if m.get('userType') == 'user' else 'Agent'}: {m.get('message')}" 
                 for m in context_messages
             ])
             
-            system_prompt = prompt_loader.format(
+            system_prompt = _prompt_loader.format(
                 "buddy_response_system", 
                 agent_name=agent_name,
                 preferences=", ".join(learning_state["preferences"]),
@@ -593,56 +748,90 @@ async def run_learning_agent(
             
             user_prompt = f"User ID: {user_id}\n\nRecent Conversation Context:\n{history_transcript}\n\nUser is responding: {user_message}"
         else:
-            system_prompt = prompt_loader.format("general_conversation_system", agent_name=agent_name)
+            system_prompt = _system_prompt("general_conversation_system", agent_name)
             
             # Add user info context if available (from resume upload OR text input)
             user_info_context = ""
             
             if resume_data:
                 # Resume was just uploaded
-                user_info_context = f"\n\nNote: The user just uploaded their resume with the following information:\n{json.dumps(resume_data, indent=2)}\n\nPlease acknowledge the upload and provide relevant career guidance based on the information. Then evaluate if their background and goals align with Alumnx's focus (React, Data Science, AI/ML, Software Engineering)."
+                user_info_context = f"\n\nNote: The user just uploaded their resume with the following information:\n{_to_pretty_json(resume_data)}\n\nPlease acknowledge the upload and provide relevant career guidance based on the information. Then evaluate if their background and goals align with Alumnx's focus (React, Data Science, AI/ML, Software Engineering)."
             elif existing_userdata and existing_userdata.get("resumeData"):
-                # User previously provided info (text or resume)
+                # User previously provided info (text or resume). Only a short
+                # digest goes into the prompt; the agent can call
+                # get_resume_data when it needs the full details.
                 stored_data = existing_userdata.get("resumeData")
                 data_source = existing_userdata.get("dataSource", "resume")
+                digest = existing_userdata.get("profileDigest") or summarize_profile(stored_data)
+                if digest:
+                    stored_info = f"{digest}\n(Call get_resume_data for the full details.)"
+                else:
+                    stored_info = _to_pretty_json(stored_data)
                 
                 if data_source == "text_input":
-                    user_info_context = f"\n\nNote: The user previously provided information about themselves:\n{json.dumps(stored_data, indent=2)}\n\nUse this information to provide personalized career guidance and evaluate if their goals align with Alumnx's focus (React, Data Science, AI/ML, Software Engineering)."
+                    user_info_context = f"\n\nNote: The user previously provided information about themselves:\n{stored_info}\n\nUse this information to provide personalized career guidance and evaluate if their goals align with Alumnx's focus (React, Data Science, AI/ML, Software Engineering)."
                 else:
-                    user_info_context = f"\n\nNote: The user's background information:\n{json.dumps(stored_data, indent=2)}\n\nUse this information to provide personalized career guidance and evaluate if their goals align with Alumnx's focus (React, Data Science, AI/ML, Software Engineering)."
+                    user_info_context = f"\n\nNote: The user's background information:\n{stored_info}\n\nUse this information to provide personalized career guidance and evaluate if their goals align with Alumnx's focus (React, Data Science, AI/ML, Software Engineering)."
             
-            user_prompt = prompt_loader.format(
+            user_prompt = _prompt_loader.format(
                 "general_conversation_user_with_message",
                 user_message=user_message,
                 user_id=user_id
             ) + user_info_context
 
-        print("🤖 Creating LangGraph ReAct agent...\n")
+        if needs_profile and not is_task_assignment_mode:
+            logger.debug("📝 No profile stored yet - agent may capture one")
+            user_prompt += PROFILE_CAPTURE_NOTE
 
-        # Create the ReAct agent
-        agent = create_react_agent(llm, tools)
+        # The agent's tools may read chats, so the user message must be stored
+        if insert_task:
+            await insert_task
+            logger.debug("✅ User message saved")
 
-        print("✅ Agent created\n")
-        print("🔄 Running agent...\n")
+        logger.debug("--- SYSTEM PROMPT ---\n%s", system_prompt)
+        logger.debug("--- USER PROMPT ---\n%s", user_prompt)
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_prompt),
+        ]
+
+        if is_task_assignment_mode:
+            # Everything the model needs is already in the prompt
+            if candidate_tasks:
+                messages.append(await llm.ainvoke(messages))
+            else:
+                messages.append(AIMessage(content="[]"))
+        else:
+            # Run the agent (the compiled ReAct agent and its tools are reused
+            # across requests). We wrap the prompts in a way that encourages tool use
+            agent = _get_react_agent(db, llm)
+            try:
+                result = await agent.ainvoke(
+                    {"messages": messages},
+                    {"recursion_limit": Config.AGENT_RECURSION_LIMIT},
+                )
+            except GraphRecursionError:
+                logger.warning(
+                    "⚠️ Agent hit the recursion limit (%d) for user: %s",
+                    Config.AGENT_RECURSION_LIMIT, user_id
+                )
+                return {
+                    "message": AGENT_STEP_LIMIT_MESSAGE,
+                    "status": "error"
+                }
+            messages = result["messages"]
 
-        # Run the agent
-        # We wrap the prompts in a way that encourages tool use
-        print(f"--- SYSTEM PROMPT ---\n{system_prompt}\n")
-        print(f"--- USER PROMPT ---\n{user_prompt}\n")
-        
-        result = await agent.ainvoke(
-            {
-                "messages": [
-                    SystemMessage(content=system_prompt),
-                    HumanMessage(content=user_prompt),
-                ]
-            }
-        )
 
-        print("✅ Agent execution completed\n")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Input tokens served from Gemini's prompt cache this turn
+            cached_tokens = sum(
+                ((getattr(m, "usage_metadata", None) or {}).get("input_token_details") or {}).get("cache_read", 0)
+                for m in messages
+            )
+            logger.debug("🧊 Cached input tokens: %d", cached_tokens)
 
         # Extract final response
-        final_message = result["messages"][-1]
+        final_message = messages[-1]
         final_response = (
             final_message.content
             if hasattr(final_message, "content")
@@ -652,18 +841,13 @@ async def run_learning_agent(
         # Handle list content from Gemini
         final_response = parse_llm_content(final_response)
 
-        print(f"{'='*60}")
-        print(f"✅ Agent completed successfully")
-        print(f"{'='*60}\n")
-        print(f"Response:\n{final_response}\n")
+        logger.info("✅ Agent completed successfully")
+        logger.debug("Response:\n%s", final_response)
 
         # If task assignment mode, parse JSON and return structured tasks
         if is_task_assignment_mode:
-            print(f"\n🔍 TASK ASSIGNMENT MODE - Parsing response")
-            print(f"📄 Raw response text:\n{final_response}\n")
-
             parsed_tasks = parse_json_from_response(final_response)
-            print(f"✅ Parsed {len(parsed_tasks)} tasks from agent response\n")
+            logger.debug("✅ Parsed %d tasks from agent response", len(parsed_tasks))
 
             # Validate and enrich tasks
             enriched_tasks, validation_summary = await validate_and_enrich_tasks(
@@ -678,24 +862,21 @@ async def run_learning_agent(
                 "status": "success",
                 "tasks": enriched_tasks,
                 "show_task_list": True, # Explicitly show the selection UI
-                "messages": result["messages"],
+                "messages": messages,
             }
             
             return response_obj
         else:
             # ENHANCED TASK REFRESH TRIGGER
             # Check if any tool was called during this turn that might have changed tasks
-            tool_called = False
-            for m in result["messages"]:
-                if hasattr(m, 'tool_calls') and m.tool_calls:
-                    for tc in m.tool_calls:
-                        if tc.get('name') in ['assign_task_to_user_tool', 'get_first_task_by_skill']:
-                            tool_called = True
-                            break
-                if tool_called: break
+            tool_called = any(
+                tc.get('name') in _TASK_REFRESH_TOOLS
+                for m in messages
+                for tc in getattr(m, 'tool_calls', None) or ()
+            )
 
             if intent == "buddy_response":
-                print("🔄 Post-processing Buddy Response for state updates")
+                logger.debug("🔄 Post-processing Buddy Response for state updates")
                 buttons = []
                 tasks = [] # Initialize tasks list
                 
@@ -703,16 +884,15 @@ async def run_learning_agent(
                     await update_buddy_status(db, user_id, "busy")
                 elif "[SCENARIO: POSTPONE]" in final_response:
                     # Try to extract time or days from LLM response
-                    time_match = re.search(r'\[NEXT_CONTACT: (.*?)\]', final_response)
+                    time_match = _NEXT_CONTACT_RE.search(final_response)
                     if time_match:
                         try:
-                            from dateutil import parser
-                            next_contact = parser.parse(time_match.group(1))
-                            print(f"🕒 Extracted specific next contact: {next_contact}")
+                            next_contact = _parse_next_contact(time_match.group(1))
+                            logger.debug("🕒 Extracted specific next contact: %s", next_contact)
                         except:
                             next_contact = datetime.now() + timedelta(days=3)
                     else:
-                        days_match = re.search(r'\[DAYS: (\d+)\]', final_response)
+                        days_match = _DAYS_RE.search(final_response)
                         days = int(days_match.group(1)) if days_match else 3
                         next_contact = datetime.now() + timedelta(days=days)
                     
@@ -722,10 +902,10 @@ async def run_learning_agent(
                     # FETCH LATEST TASKS FOR AUTO-REFRESH
                     latest_state = await get_user_learning_state(db, user_id)
                     tasks = latest_state["active_tasks"]
-                    print(f"📊 Task change detected: returning {len(tasks)} active tasks for UI refresh")
+                    logger.debug("📊 Task change detected: returning %d active tasks for UI refresh", len(tasks))
                 
                 # Strip all metadata tags from final response (Scenario, Next Contact, Days, Response Type)
-                cleaned_response = re.sub(r'\[(?:SCENARIO|NEXT_CONTACT|DAYS|RESPONSE_TYPE):.*?\]', '', final_response).strip()
+                cleaned_response = _TAG_CLEANUP_RE.sub('', final_response).strip()
                 
                 return {
                     "message": cleaned_response,
@@ -733,7 +913,7 @@ async def run_learning_agent(
                     "tasks": tasks,
                     "show_task_list": False, # DO NOT show selection UI for auto-assignments
                     "status": "success",
-                    "messages": result["messages"],
+                    "messages": messages,
                 }
             else:
                 cleaned_response, buttons = extract_response_type_and_buttons(final_response)
@@ -742,7 +922,7 @@ async def run_learning_agent(
                 if tool_called:
                     latest_state = await get_user_learning_state(db, user_id)
                     tasks = latest_state["active_tasks"]
-                    print(f"📊 Tool-based task change detected in {intent} mode: returning {len(tasks)} tasks")
+                    logger.debug("📊 Tool-based task change detected in %s mode: returning %d tasks", intent, len(tasks))
 
                 return {
                     "message": cleaned_response,
@@ -750,14 +930,24 @@ async def run_learning_agent(
                     "tasks": tasks,
                     "show_task_list": False,
                     "status": "success",
-                    "messages": result["messages"],
+                    "messages": messages,
                 }
 
     except Exception as e:
-        print(f"\n❌ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ ERROR: %s", e)
         return {
             "message": f"An error occurred: {str(e)}",
             "status": "error"
-        }
\ No newline at end of file
+        }
+    finally:
+        # An early return or error can leave the speculative intent
+        # classification unused, and the message insert still in flight
+        if intent_task and not intent_task.done():
+            intent_task.cancel()
+        elif intent_task and not intent_task.cancelled():
+            intent_task.exception()  # mark any error as retrieved
+        if insert_task:
+            try:
+                await insert_task
+            except Exception as e:
+                logger.error("❌ Failed to save user message for %s: %s", user_id, e)
\ No newline at end of file
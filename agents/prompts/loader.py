@@ -1,4 +1,5 @@
 import os
+import string
 
 class PromptLoader:
     """Load and format prompts from text files"""
@@ -6,6 +7,17 @@ class PromptLoader:
     def __init__(self, prompts_dir="prompts"):
         self.prompts_dir = prompts_dir
         self._cache = {}
+        self._segments = {}
+        self._preload()
+    
+    def _preload(self):
+        """Read every template in prompts_dir once, up front"""
+        if not os.path.isdir(self.prompts_dir):
+            return
+        for file_name in os.listdir(self.prompts_dir):
+            prompt_name, ext = os.path.splitext(file_name)
+            if ext == ".txt":
+                self.load(prompt_name)
     
     def load(self, prompt_name):
         """Load a prompt from file"""
@@ -18,11 +30,29 @@ class PromptLoader:
             with open(file_path, "r", encoding="utf-8") as f:
                 prompt_text = f.read()
             self._cache[prompt_name] = prompt_text
+            self._segments[prompt_name] = self._parse(prompt_text)
             return prompt_text
         except FileNotFoundError:
             raise FileNotFoundError(f"Prompt file not found: {file_path}")
     
+    @staticmethod
+    def _parse(prompt_text):
+        """Split a template into (literal, field, format_spec) once, or None if it needs full str.format"""
+        segments = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(prompt_text):
+            if conversion or (field is not None and not field.isidentifier()):
+                return None
+            segments.append((literal, field, format_spec))
+        return segments
+    
     def format(self, prompt_name, **kwargs):
         """Load and format a prompt with variables"""
         prompt_text = self.load(prompt_name)
-        return prompt_text.format(**kwargs)
\ No newline at end of file
+        segments = self._segments.get(prompt_name)
+        if segments is None:
+            return prompt_text.format_map(kwargs)
+        # Join the pre-parsed pieces instead of re-parsing the template
+        return "".join(
+            literal if field is None else literal + format(kwargs[field], format_spec)
+            for literal, field, format_spec in segments
+        )
\ No newline at end of file
@@ -1,3 +1,37 @@
+import logging
+import re
+
+from .response_cache import ResponseCache
+
+
+logger = logging.getLogger(__name__)
+
+
+# userId -> stored agentName ("" if none), so the per-message lookup doesn't
+# hit db.agents every time. Writers call remember_agent_name(); entries from
+# other processes' renames age out after the TTL.
+AGENT_NAME_CACHE_TTL = 300
+_agent_name_cache = ResponseCache(maxsize=10000, ttl=AGENT_NAME_CACHE_TTL)
+
+# Matches and captures the name in one pass
+_NAME_UPDATE_RE = re.compile(r"Updated the name of the agent to (?P<name>.+)", re.DOTALL)
+
+
+async def get_agent_name(db, user_id: str) -> str:
+    """Return the user's stored agent name ("" if none), cached per user."""
+    agent_name = _agent_name_cache.get(user_id)
+    if agent_name is None:
+        agent_doc = await db.agents.find_one({"userId": user_id}, {"agentName": 1})
+        agent_name = (agent_doc or {}).get("agentName") or ""
+        _agent_name_cache.set(user_id, agent_name)
+    return agent_name
+
+
+def remember_agent_name(user_id: str, agent_name: str):
+    """Record a just-saved agent name so the next message sees it at once."""
+    _agent_name_cache.set(user_id, agent_name)
+
+
 async def handle_agent_name_update(db, user_id: str, message: str) -> str:
     """
     Handle agent name update messages.
@@ -7,29 +41,26 @@ async def handle_agent_name_update(db, user_id: str, message: str) -> str:
     Returns: "Hello! I'm <agent_name>. How can I help you today?"
     """
     try:
-        print(f"🔄 Processing agent name update for user: {user_id}")
-        print(f"📝 Message: {message}")
+        logger.debug("🔄 Processing agent name update for user: %s", user_id)
+        logger.debug("📝 Message: %s", message)
 
         # Extract agent name from the message
         # Format: "Updated the name of the agent to <agent_name>"
-        prefix = "Updated the name of the agent to "
+        match = _NAME_UPDATE_RE.match(message)
 
-        if message.startswith(prefix):
-            agent_name = message[len(prefix) :].strip()
-            print(f"✅ Extracted agent name: {agent_name}")
+        if match:
+            agent_name = match.group("name").strip()
+            logger.debug("✅ Extracted agent name: %s", agent_name)
 
             # Create personalized greeting
             greeting = f"Hello! I'm {agent_name}. How can I help you today?"
-            print(f"💬 Generated greeting: {greeting}")
+            logger.debug("💬 Generated greeting: %s", greeting)
 
             return greeting
         else:
-            print("⚠️ Message format didn't match expected pattern")
+            logger.warning("⚠️ Message format didn't match expected pattern")
             return "Hello! How can I help you today?"
 
     except Exception as e:
-        print(f"❌ Error in handle_agent_name_update: {str(e)}")
-        import traceback
-
-        traceback.print_exc()
+        logger.exception("❌ Error in handle_agent_name_update: %s", e)
         return "Hello! How can I help you today?"
@@ -0,0 +1,28 @@
+# chat_window.py
+
+# Rough Gemini-style estimate; close enough to budget prompt context
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of text (~4 characters per token)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_chats_to_budget(chats: list, budget: int) -> list:
+    """
+    Keep the most recent chat docs whose messages fit in a token budget.
+
+    Walks backwards from the newest message and stops at the first one that
+    would overflow the budget, so the result is always a contiguous, still
+    chronological tail of `chats`. The newest message is always kept.
+    """
+    kept = 0
+    used = 0
+    for chat in reversed(chats):
+        cost = estimate_tokens(str(chat.get("message", "")))
+        if kept and used + cost > budget:
+            break
+        used += cost
+        kept += 1
+    return chats[len(chats) - kept:]
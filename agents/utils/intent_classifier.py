@@ -1,40 +1,113 @@
+import logging
+import re
+
 from langchain_core.messages import HumanMessage
 from .response_parser import parse_llm_content
+from .response_cache import ResponseCache, make_cache_key, normalize_text
+
+
+logger = logging.getLogger(__name__)
+
+
+# Fixed messages sent by the app itself (lowercased prefix -> intent); these
+# never need classifying, whatever follows the prefix
+SYSTEM_TRIGGERS = (
+    ("updated the goals", "task_assignment"),
+    ("updated the name of the agent", "general_conversation"),
+)
+# One alternation over all triggers; the matching group's index picks the intent
+_SYSTEM_TRIGGER_RE = re.compile(
+    r"\s*(?:" + "|".join(f"({re.escape(prefix)})" for prefix, _ in SYSTEM_TRIGGERS) + ")",
+    re.IGNORECASE,
+)
+
+# High-precision phrasings answered without an LLM call; anything that
+# doesn't match falls through to the LLM classifier. Each rule must match
+# the whole normalized message (lowercased, single-spaced, trailing "." /
+# "!" dropped), and questions always go to the LLM, so "How do I update
+# my goals?" is never taken for a goal update.
+RULES_MAX_WORDS = 12
+
+_TASK_ASSIGNMENT_RE = re.compile(
+    r"(?:i(?:'ve| have)? )?(?:just )?(?:updated?|changed?|revised?) (?:the |my )?goals?"
+    r"|(?:please )?(?:recommend|suggest) (?:some |new |revised )?tasks?"
+    r"(?: (?:for|based on) my (?:new |updated )?goals?)?"
+    r"|revised tasks?(?: please)?"
+)
+_BUDDY_RESPONSE_RE = re.compile(
+    r"(?:(?:please )?(?:assign|give) me the )?next task(?: please)?"
+    r"|assign (?:it|the next one)(?: please)?"
+    r"|i'?m busy(?: (?:right )?now| today)?"
+    r"|not now"
+    r"|(?:postpone it|contact me) (?:later|tomorrow|next week)"
+    r"|(?:i'?ll do )?(?:frontend|backend|react|python)(?: today)?"
+)
+
+# LLM classifications of recurring messages
+_intent_cache = ResponseCache(maxsize=1024, ttl=3600)
+
+
+def normalize_intent(raw_intent: str) -> str:
+    """Map a free-form LLM answer onto one of the supported intents."""
+    intent = (raw_intent or "").lower()
+    if "task_assignment" in intent:
+        return "task_assignment"
+    elif "buddy_response" in intent:
+        return "buddy_response"
+    elif "general_conversation" in intent:
+        return "general_conversation"
+    # Default to general conversation if unclear
+    return "general_conversation"
+
+
+def match_intent_rules(user_message: str):
+    """Intent for unambiguous phrasings, or None if the LLM should decide."""
+    trigger = _SYSTEM_TRIGGER_RE.match(user_message)
+    if trigger:
+        return SYSTEM_TRIGGERS[trigger.lastindex - 1][1]
+    words = user_message.lower().split()
+    if "?" in user_message or len(words) > RULES_MAX_WORDS:
+        return None
+    message = " ".join(words).rstrip(".!")
+    if _TASK_ASSIGNMENT_RE.fullmatch(message):
+        return "task_assignment"
+    if _BUDDY_RESPONSE_RE.fullmatch(message):
+        return "buddy_response"
+    return None
 
 
 async def classify_user_intent(llm, user_message: str, prompt_loader) -> str:
     """
-    Classify user intent using LLM.
+    Classify user intent: local rules first, then the LLM (cached per message).
     
     Returns:
         - "task_assignment": User wants task recommendations based on goals
         - "general_conversation": General career/learning questions
     """
     try:
-        print(f"\n🎯 Classifying intent for message: {user_message}")
+        logger.debug("🎯 Classifying intent for message: %s", user_message)
+
+        intent = match_intent_rules(user_message)
+        if intent:
+            logger.info("✅ Classified intent (rules): %s", intent)
+            return intent
+
+        cache_key = make_cache_key(getattr(llm, "model", ""), normalize_text(user_message))
+        intent = _intent_cache.get(cache_key)
+        if intent:
+            logger.info("✅ Classified intent (cached): %s", intent)
+            return intent
         
         intent_prompt = prompt_loader.format("intent_classification", user_message=user_message)
 
         result = await llm.ainvoke([HumanMessage(content=intent_prompt)])
-        intent = parse_llm_content(result.content).lower()
-        
-        # Validate intent
-        if "task_assignment" in intent:
-            intent = "task_assignment"
-        elif "buddy_response" in intent:
-            intent = "buddy_response"
-        elif "general_conversation" in intent:
-            intent = "general_conversation"
-        else:
-            # Default to general conversation if unclear
-            intent = "general_conversation"
+        intent = normalize_intent(parse_llm_content(result.content))
+        _intent_cache.set(cache_key, intent)
         
-        print(f"✅ Classified intent: {intent}\n")
+        logger.info("✅ Classified intent: %s", intent)
         return intent
         
     except Exception as e:
-        print(f"❌ Error in intent classification: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error in intent classification: %s", e)
         # Default to general conversation on error
         return "general_conversation"
\ No newline at end of file
@@ -0,0 +1,16 @@
+# object_ids.py
+
+from functools import lru_cache
+
+from bson import ObjectId
+
+
+@lru_cache(maxsize=2048)
+def to_object_id(value):
+    """
+    ObjectId for an id string, or None if it isn't a valid ObjectId.
+
+    Cached because the same project and task ids are validated and
+    converted on every agent turn.
+    """
+    return ObjectId(value) if ObjectId.is_valid(value) else None
@@ -0,0 +1,51 @@
+# response_cache.py
+
+import copy
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("Hi!!" -> "hi")."""
+    return _SPACE_RE.sub(" ", _NON_WORD_RE.sub("", text.lower())).strip()
+
+
+def make_cache_key(*parts: str) -> str:
+    """Stable key for a tuple of strings (model, prompt name, message, context...)."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Small in-process LRU cache for structured LLM results, with a TTL.
+
+    Values are deep-copied on the way in and out so callers can mutate
+    what they get back without corrupting the cache.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value):
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
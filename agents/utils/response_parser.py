@@ -1,5 +1,44 @@
 import json
-import re
+import logging
+
+import orjson
+
+
+logger = logging.getLogger(__name__)
+
+
+def find_json_block(text: str, open_char: str = "{", close_char: str = "}"):
+    """
+    Return the first balanced JSON object (or array, with "[" / "]") in text.
+
+    Single left-to-right pass tracking nesting depth; brackets inside string
+    literals are ignored. Returns None if no balanced block is found.
+    """
+    start = text.find(open_char)
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == open_char:
+            depth += 1
+        elif ch == close_char:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
 
 
 def parse_json_from_response(response_text: str) -> list:
@@ -8,57 +47,63 @@ def parse_json_from_response(response_text: str) -> list:
     Returns list of task objects with id and title.
     """
     try:
-        print(f"\n📊 Parsing response:\n{response_text}\n")
+        logger.debug("📊 Parsing response:\n%s", response_text)
 
-        # Remove markdown code blocks if present
+        # Fast path: the prompt asks for ONLY a JSON array, which the LLM
+        # usually honours - parse it as-is before any cleanup
         cleaned = response_text.strip()
-        cleaned = re.sub(r"```json\s*", "", cleaned)
-        cleaned = re.sub(r"```\s*", "", cleaned)
-        cleaned = cleaned.strip()
+        if cleaned.startswith("["):
+            try:
+                tasks = orjson.loads(cleaned)
+            except orjson.JSONDecodeError:
+                pass
+            else:
+                if isinstance(tasks, list):
+                    logger.debug("✅ Successfully parsed %d tasks", len(tasks))
+                    return tasks
+
+        # Remove markdown code blocks if present (fences elsewhere in the
+        # text are skipped by the bracket scan below)
+        cleaned = cleaned.removeprefix("```json").removeprefix("```").removesuffix("```").strip()
 
         # Extract JSON array if it's embedded in text
         # Look for pattern: [ ... ]
-        json_match = re.search(r"\[.*\]", cleaned, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            print(f"📌 Found JSON match:\n{json_str}\n")
+        json_str = find_json_block(cleaned, "[", "]")
+        if json_str:
+            logger.debug("📌 Found JSON match:\n%s", json_str)
         else:
             json_str = cleaned
-            print(f"⚠️ No JSON match pattern found, trying full response\n")
+            logger.debug("⚠️ No JSON match pattern found, trying full response")
 
-        # Try to parse JSON
-        tasks = json.loads(json_str)
+        # Try to parse JSON (orjson's decode error subclasses json's)
+        tasks = orjson.loads(json_str)
 
         if isinstance(tasks, list):
-            print(f"✅ Successfully parsed {len(tasks)} tasks\n")
-            for i, task in enumerate(tasks, 1):
-                print(f"   Task {i}: {task.get('title')} (ID: {task.get('id')})")
+            logger.debug("✅ Successfully parsed %d tasks", len(tasks))
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, task in enumerate(tasks, 1):
+                    logger.debug("   Task %d: %s (ID: %s)", i, task.get('title'), task.get('id'))
             return tasks
 
-        print(f"⚠️ Parsed data is not a list: {type(tasks)}\n")
+        logger.warning("⚠️ Parsed data is not a list: %s", type(tasks))
         return []
 
     except json.JSONDecodeError as e:
-        print(f"❌ JSON Parse Error: {str(e)}")
-        print(
-            f"📝 Attempted to parse:\n{json_str if 'json_str' in locals() else response_text}\n"
+        logger.warning("❌ JSON Parse Error: %s", e)
+        logger.debug(
+            "📝 Attempted to parse:\n%s", json_str if 'json_str' in locals() else response_text
         )
         return []
     except Exception as e:
-        print(f"❌ Unexpected error during parsing: {str(e)}\n")
+        logger.exception("❌ Unexpected error during parsing: %s", e)
         return []
 
 
 def parse_llm_content(content):
     """Parse LLM response content, handling list and string formats"""
     if isinstance(content, list):
-        content_parts = []
-        for part in content:
-            if isinstance(part, str):
-                content_parts.append(part)
-            elif hasattr(part, "text"):
-                content_parts.append(part.text)
-            else:
-                content_parts.append(str(part))
-        return "".join(content_parts).strip()
+        return "".join(
+            part if isinstance(part, str) else part.text if hasattr(part, "text") else str(part)
+            for part in content
+        ).strip()
     return content
@@ -0,0 +1,77 @@
+# retry.py
+
+import asyncio
+import functools
+import logging
+import random
+
+from pymongo.errors import AutoReconnect, NetworkTimeout
+
+logger = logging.getLogger(__name__)
+
+# Driver errors that mean "the server/network hiccupped", safe to retry for reads
+TRANSIENT_DB_ERRORS = (AutoReconnect, NetworkTimeout)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """'Full jitter' backoff: a random delay in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def retry_async(call, *, attempts: int = 3, base: float = 0.5, cap: float = 4.0,
+                      retry_on: tuple = (), retry_if=None, delay_for=None):
+    """
+    Await call() until it succeeds, retrying transient failures with backoff.
+
+    Args:
+        call: Zero-argument callable returning an awaitable
+        attempts: Total number of tries
+        base / cap: Backoff parameters in seconds
+        retry_on: Exception types that trigger a retry
+        retry_if: Optional predicate on the result; True means retry
+        delay_for: Optional function of a retried result giving the seconds
+            to wait (e.g. from Retry-After); None falls back to backoff
+
+    Returns:
+        The first accepted result, or the last result once attempts run out.
+        The last exception is re-raised if the final attempt still fails.
+    """
+    for attempt in range(attempts):
+        is_last = attempt == attempts - 1
+        delay = None
+        try:
+            result = await call()
+        except retry_on as e:
+            if is_last:
+                raise
+            logger.warning("⚠️ Transient error (attempt %d/%d): %s", attempt + 1, attempts, e)
+        else:
+            if retry_if is None or is_last or not retry_if(result):
+                return result
+            logger.warning("⚠️ Retryable result (attempt %d/%d)", attempt + 1, attempts)
+            if delay_for is not None:
+                delay = delay_for(result)
+
+        await asyncio.sleep(backoff_delay(attempt, base, cap) if delay is None else delay)
+
+
+def with_db_retry(func=None, *, attempts: int = 3, base: float = 0.2, cap: float = 2.0):
+    """
+    Decorator retrying an async DB helper on transient Motor/PyMongo errors.
+    Only wrap idempotent operations (reads, upserts).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await retry_async(
+                lambda: fn(*args, **kwargs),
+                attempts=attempts,
+                base=base,
+                cap=cap,
+                retry_on=TRANSIENT_DB_ERRORS,
+            )
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -1,36 +1,125 @@
 # agents/utils/study_buddy_helper.py
 
+import asyncio
+import logging
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from bson import ObjectId
 
+from .object_ids import to_object_id
+
+
+logger = logging.getLogger(__name__)
+
+
+# Per-request snapshot of the user's assignment:
+# {"user_id", "assigned_ids": frozenset or None, "assigned_titles": list or None}.
+# Shared by the learning state, the agent's task tools and the post-run
+# validation so the assignments doc is read once per request. A ContextVar
+# because the tools are shared across requests.
+_assignment_snapshot = ContextVar("assignment_snapshot", default=None)
+
+# Fields of a candidate task used to pick one (title) and by the callers
+_CANDIDATE_TASK_FIELDS = {"title": 1, "name": 1, "description": 1}
+
+# Natural title order ("Task 2" before "Task 10"), applied by MongoDB; see
+# the matching tasks index in main.DB_INDEXES. The collation covers the
+# whole query, so strength stays at the default (3) to keep the title/id
+# exclusions exact. Intended differences from the old Python sort key:
+# case only breaks ties between otherwise equal titles, and runs of
+# whitespace are not collapsed.
+TITLE_COLLATION = {"locale": "en", "numericOrdering": True}
+
+
+def start_assignment_snapshot(user_id: str):
+    """Begin a per-request assignment snapshot (call before anything reads it)."""
+    _assignment_snapshot.set({"user_id": user_id, "assigned_ids": None, "assigned_titles": None})
+
+
+def _snapshot_for(user_id: str):
+    snapshot = _assignment_snapshot.get()
+    if snapshot is not None and snapshot["user_id"] == user_id:
+        return snapshot
+    return None
+
+
+def _record_assignment(user_id: str, tasks: list) -> frozenset:
+    assigned_ids = frozenset(str(t["taskId"]) for t in tasks if t.get("taskId"))
+    snapshot = _snapshot_for(user_id)
+    if snapshot is not None:
+        snapshot["assigned_ids"] = assigned_ids
+        snapshot["assigned_titles"] = None
+    return assigned_ids
+
+
+async def get_assigned_task_ids(db, user_id: str) -> frozenset:
+    """
+    Ids of every task in the user's assignment, from this request's
+    snapshot when one was recorded, otherwise read (and recorded) now.
+    """
+    snapshot = _snapshot_for(user_id)
+    if snapshot is not None and snapshot["assigned_ids"] is not None:
+        return snapshot["assigned_ids"]
+    
+    assignment = await db.assignments.find_one(
+        {"userId": user_id}, {"_id": 0, "tasks.taskId": 1}
+    )
+    return _record_assignment(user_id, assignment.get("tasks", []) if assignment else [])
+
+
+async def _get_assigned_task_titles(db, user_id: str, assigned_oids: list) -> list:
+    """Titles of the user's assigned tasks, read once per request snapshot."""
+    snapshot = _snapshot_for(user_id)
+    if snapshot is not None and snapshot["assigned_titles"] is not None:
+        return snapshot["assigned_titles"]
+    
+    assigned_titles = []
+    if assigned_oids:
+        existing_tasks = await db.tasks.find(
+            {"_id": {"$in": assigned_oids}}, {"_id": 0, "title": 1}
+        ).to_list(100)
+        assigned_titles = [t.get("title") for t in existing_tasks if t.get("title")]
+    if snapshot is not None:
+        snapshot["assigned_titles"] = assigned_titles
+    return assigned_titles
+
+
 async def get_user_learning_state(db, user_id: str):
     """
     Fetch user's preferences, assignments, and current buddy status.
     """
-    print(f"🔍 [DEBUG] get_user_learning_state for user_id: {user_id}")
+    logger.debug("🔍 get_user_learning_state for user_id: %s", user_id)
     
-    # 1. Fetch Preferences
-    preferences_doc = await db.preferences.find_one({"userId": user_id})
+    # Preferences, assignments and agent meta are independent reads
+    preferences_doc, assignment, agent_meta = await asyncio.gather(
+        db.preferences.find_one({"userId": user_id}, {"_id": 0, "preferences": 1}),
+        db.assignments.find_one({"userId": user_id}, {"_id": 0, "tasks": 1}),
+        db.agents.find_one(
+            {"userId": user_id},
+            {"_id": 0, "agentName": 1, "buddy_status": 1, "next_buddy_contact_date": 1}
+        ),
+    )
+    
+    # 1. Preferences
     preferences = preferences_doc.get("preferences", []) if preferences_doc else []
-    print(f"🔍 [DEBUG] Preferences found: {preferences}")
+    logger.debug("🔍 Preferences found: %s", preferences)
     
-    # 2. Fetch Assignments
-    assignment = await db.assignments.find_one({"userId": user_id})
+    # 2. Assignments
     all_tasks = assignment.get("tasks", []) if assignment else []
-    print(f"🔍 [DEBUG] Total tasks in assignment: {len(all_tasks)}")
+    _record_assignment(user_id, all_tasks)
+    logger.debug("🔍 Total tasks in assignment: %s", len(all_tasks))
     
     # Filter active and completed tasks
     active_tasks = [t for t in all_tasks if t.get("taskStatus") == "active"]
     # Fixed: Check for taskStatus == "completed"
     completed_tasks = [t for t in all_tasks if t.get("taskStatus") == "completed"]
-    print(f"🔍 [DEBUG] Active: {len(active_tasks)}, Completed: {len(completed_tasks)}")
+    logger.debug("🔍 Active: %s, Completed: %s", len(active_tasks), len(completed_tasks))
     
-    # 3. Fetch Agent/User Meta (for scheduling)
-    agent_meta = await db.agents.find_one({"userId": user_id})
+    # 3. Agent/User Meta (for scheduling)
     if agent_meta:
-        print(f"🔍 [DEBUG] Agent meta found: name={agent_meta.get('agentName')}, status={agent_meta.get('buddy_status')}")
+        logger.debug("🔍 Agent meta found: name=%s, status=%s", agent_meta.get('agentName'), agent_meta.get('buddy_status'))
     else:
-        print(f"🔍 [DEBUG] Agent meta NOT FOUND for {user_id}")
+        logger.debug("🔍 Agent meta NOT FOUND for %s", user_id)
         
     buddy_status = agent_meta.get("buddy_status", "active") if agent_meta else "active"
     next_contact = agent_meta.get("next_buddy_contact_date") if agent_meta else None
@@ -39,7 +128,7 @@ async def get_user_learning_state(db, user_id: str):
     
     # Auto-reset if DND period has passed
     if buddy_status == "postponed" and next_contact and current_time > next_contact:
-        print(f"⏰ DND period for {user_id} has expired! Resetting to active.")
+        logger.info("⏰ DND period for %s has expired! Resetting to active.", user_id)
         await update_buddy_status(db, user_id, "active")
         buddy_status = "active"
     
@@ -47,6 +136,7 @@ async def get_user_learning_state(db, user_id: str):
         "preferences": preferences,
         "active_tasks": active_tasks,
         "completed_tasks": completed_tasks,
+        "agent_name": (agent_meta or {}).get("agentName") or "",
         "buddy_status": buddy_status,
         "next_contact_date": next_contact,
         "current_time": current_time,
@@ -54,140 +144,122 @@ async def get_user_learning_state(db, user_id: str):
         "has_active_tasks": len(active_tasks) > 0
     }
 
-async def get_first_task_for_skill(db, skill_name: str, user_id: str):
+def _skill_filter(skill_name: str) -> dict:
+    return {
+        "$or": [
+            {"skillType": {"$regex": f"^{skill_name}$", "$options": "i"}},
+            {"category": {"$regex": f"^{skill_name}$", "$options": "i"}},
+            {"title": {"$regex": skill_name, "$options": "i"}}
+        ]
+    }
+
+
+async def _first_task_in_projects(db, project_ids: list, filters: list):
     """
-    Find the first task in the database for a specific skill that isn't already assigned to the user.
-    Prioritizes tasks from assigned projects in their sequence order.
+    First task (natural title order) from the earliest project in
+    project_ids that has one matching filters. MongoDB sorts and returns
+    only the first task of each project.
     """
-    print(f"🔍 [DEBUG] get_first_task_for_skill: {skill_name} for user {user_id}")
+    if not project_ids:
+        return None
     
-    # Get user's current tasks to avoid duplicates
-    assignment = await db.assignments.find_one({"userId": user_id})
-    assigned_task_ids = []
-    assigned_titles = []
-    if assignment and assignment.get("tasks"):
-        assigned_task_ids = [
-            ObjectId(t["taskId"]) 
-            for t in assignment["tasks"] 
-            if t.get("taskId") and ObjectId.is_valid(t["taskId"])
-        ]
-        
-        # Get titles to avoid duplicates (sometimes same task exists in different projects)
-        if assigned_task_ids:
-            existing_tasks = await db.tasks.find({"_id": {"$in": assigned_task_ids}}).to_list(100)
-            assigned_titles = [t.get("title") for t in existing_tasks if t.get("title")]
-    
-    # 1. CHECK ASSIGNED PROJECTS IN SEQUENCE
-    assigned_proj_docs = await db.assignedprojects.find({"userId": user_id}).sort("sequenceId", 1).to_list(100)
+    pipeline = [
+        {"$match": {"$and": [{"project_id": {"$in": project_ids}}, *filters]}},
+        {"$project": {**_CANDIDATE_TASK_FIELDS, "project_id": 1}},
+        {"$sort": {"title": 1}},
+        {"$group": {"_id": "$project_id", "task": {"$first": "$$ROOT"}}},
+    ]
+    firsts = await db.tasks.aggregate(pipeline, collation=TITLE_COLLATION).to_list(length=None)
     
-    for proj_doc in assigned_proj_docs:
-        project_id = proj_doc["projectId"]
-        print(f"🔍 [DEBUG] Checking assigned project: {project_id}")
-        
-        # Search for tasks in THIS project that match the skill
-        task_query = {
-            "$and": [
-                {"project_id": project_id},
-                {"_id": {"$nin": assigned_task_ids}},
-                {"title": {"$nin": assigned_titles}},
-                {
-                    "$or": [
-                        {"skillType": {"$regex": f"^{skill_name}$", "$options": "i"}},
-                        {"category": {"$regex": f"^{skill_name}$", "$options": "i"}},
-                        {"title": {"$regex": skill_name, "$options": "i"}}
-                    ]
-                }
-            ]
-        }
-        
-        candidate_tasks = await db.tasks.find(task_query).to_list(100)
-        if candidate_tasks:
-            import re
-            def natural_sort_key(s):
-                s = " ".join(s.split()).strip()
-                return [int(text) if text.isdigit() else text.lower()
-                        for text in re.split('([0-9]+)', s)]
-            
-            candidate_tasks.sort(key=lambda t: natural_sort_key(t.get("title", "")))
-            task = candidate_tasks[0]
-            print(f"✅ Found task in assigned project {project_id}: {task.get('title')}")
-            return task
+    project_rank = {}
+    for rank, project_id in enumerate(project_ids):
+        project_rank.setdefault(project_id, rank)
+    first = min(firsts, key=lambda row: project_rank[row["_id"]], default=None)
+    return first["task"] if first else None
 
-    # 2. IF NOT FOUND IN ASSIGNED PROJECTS, SEARCH ALL PROJECTS MATCHING SKILL KEYWORD
+
+async def _first_task_in_assigned_projects(db, user_id: str, skill_name: str, exclusions: list):
+    """Stage 1: skill-matching tasks from the user's assigned projects, in their sequence order."""
+    assigned_proj_docs = await db.assignedprojects.find(
+        {"userId": user_id}, {"_id": 0, "projectId": 1}
+    ).sort("sequenceId", 1).to_list(100)
+    project_ids = [doc["projectId"] for doc in assigned_proj_docs if doc.get("projectId")]
+    logger.debug("🔍 Checking assigned projects: %s", project_ids)
+    return await _first_task_in_projects(db, project_ids, [*exclusions, _skill_filter(skill_name)])
+
+
+async def _first_task_in_matching_projects(db, skill_name: str, exclusions: list):
+    """Stage 2: any task from projects whose name or description mentions the skill."""
     project_query = {
         "$or": [
             {"name": {"$regex": skill_name, "$options": "i"}},
             {"description": {"$regex": skill_name, "$options": "i"}}
         ]
     }
-    matching_projects = await db.projects.find(project_query).to_list(20)
+    matching_projects = await db.projects.find(project_query, {"name": 1}).to_list(20)
+    logger.debug("🔍 Checking matching projects: %s", [p.get('name') for p in matching_projects])
+    return await _first_task_in_projects(
+        db, [str(proj["_id"]) for proj in matching_projects], exclusions
+    )
+
+
+async def get_first_task_for_skill(db, skill_name: str, user_id: str):
+    """
+    Find the first task in the database for a specific skill that isn't already assigned to the user.
+    Prioritizes tasks from assigned projects in their sequence order.
+    """
+    logger.debug("🔍 get_first_task_for_skill: %s for user %s", skill_name, user_id)
     
-    for proj in matching_projects:
-        proj_id = str(proj["_id"])
-        print(f"🔍 [DEBUG] Checking matching project: {proj_id} ({proj.get('name')})")
-        
-        task_query = {
-            "$and": [
-                {"project_id": proj_id},
-                {"_id": {"$nin": assigned_task_ids}},
-                {"title": {"$nin": assigned_titles}}
-            ]
-        }
-        
-        candidate_tasks = await db.tasks.find(task_query).to_list(100)
-        if candidate_tasks:
-            import re
-            def natural_sort_key(s):
-                s = " ".join(s.split()).strip()
-                return [int(text) if text.isdigit() else text.lower()
-                        for text in re.split('([0-9]+)', s)]
-            
-            candidate_tasks.sort(key=lambda t: natural_sort_key(t.get("title", "")))
-            task = candidate_tasks[0]
-            print(f"✅ Found task in matching project {proj_id}: {task.get('title')}")
-            return task
+    # Get user's current tasks to avoid duplicates (only the ids are needed)
+    assigned_task_ids = [
+        oid for oid in map(to_object_id, await get_assigned_task_ids(db, user_id)) if oid
+    ]
+
+    # Get titles to avoid duplicates (sometimes same task exists in different projects)
+    assigned_titles = await _get_assigned_task_titles(db, user_id, assigned_task_ids)
+    exclusions = [
+        {"_id": {"$nin": assigned_task_ids}},
+        {"title": {"$nin": assigned_titles}}
+    ]
+    
+    # 1. CHECK ASSIGNED PROJECTS IN SEQUENCE
+    # (usually hits, so stage 2's regex scan over projects only runs on a miss)
+    assigned_task = await _first_task_in_assigned_projects(db, user_id, skill_name, exclusions)
+    if assigned_task:
+        logger.debug("✅ Found task in assigned project %s: %s", assigned_task.get('project_id'), assigned_task.get('title'))
+        return assigned_task
+
+    # 2. IF NOT FOUND IN ASSIGNED PROJECTS, SEARCH ALL PROJECTS MATCHING SKILL KEYWORD
+    matching_task = await _first_task_in_matching_projects(db, skill_name, exclusions)
+    if matching_task:
+        logger.debug("✅ Found task in matching project %s: %s", matching_task.get('project_id'), matching_task.get('title'))
+        return matching_task
 
     # 3. FINAL FALLBACK: Broad search across ALL tasks
-    task_query = {
-        "$and": [
-            {
-                "$or": [
-                    {"skillType": {"$regex": f"^{skill_name}$", "$options": "i"}},
-                    {"category": {"$regex": f"^{skill_name}$", "$options": "i"}},
-                    {"title": {"$regex": skill_name, "$options": "i"}}
-                ]
-            },
-            {"_id": {"$nin": assigned_task_ids}},
-            {"title": {"$nin": assigned_titles}}
-        ]
-    }
+    # (only on a miss: an unanchored regex over every task is the costly query)
+    task_query = {"$and": [_skill_filter(skill_name), *exclusions]}
     
-    print(f"🔍 [DEBUG] Falling back to broad task search for {skill_name}")
-    candidate_tasks = await db.tasks.find(task_query).to_list(100)
+    logger.debug("🔍 Falling back to broad task search for %s", skill_name)
+    candidate_tasks = await db.tasks.find(task_query, _CANDIDATE_TASK_FIELDS).collation(
+        TITLE_COLLATION
+    ).sort("title", 1).limit(1).to_list(1)
     
     if candidate_tasks:
-        import re
-        def natural_sort_key(s):
-            s = " ".join(s.split()).strip()
-            return [int(text) if text.isdigit() else text.lower()
-                    for text in re.split('([0-9]+)', s)]
-        
-        candidate_tasks.sort(key=lambda t: natural_sort_key(t.get("title", "")))
         task = candidate_tasks[0]
-        print(f"✅ Found task (broad search): {task.get('title')}")
+        logger.debug("✅ Found task (broad search): %s", task.get('title'))
         return task
     
-    print(f"⚠️ No unassigned tasks found for skill: {skill_name}")
+    logger.warning("⚠️ No unassigned tasks found for skill: %s", skill_name)
     return None
 
 async def assign_task_to_user(db, user_id: str, task_id: ObjectId):
     """
     Assign a task to a user's assignments collection.
     """
-    print(f"🔗 Assigning task {task_id} to user {user_id}...")
+    logger.debug("🔗 Assigning task %s to user %s...", task_id, user_id)
     
     # Check if assignment document exists
-    assignment = await db.assignments.find_one({"userId": user_id})
+    assignment = await db.assignments.find_one({"userId": user_id}, {"_id": 1})
     
     task_entry = {
         "taskId": str(task_id),
@@ -207,7 +279,7 @@ async def assign_task_to_user(db, user_id: str, task_id: ObjectId):
     
     if not assignment:
         # Create new assignment doc
-        print("📝 Creating new assignment document...")
+        logger.debug("📝 Creating new assignment document...")
         await db.assignments.insert_one({
             "userId": user_id,
             "tasks": [task_entry],
@@ -216,7 +288,7 @@ async def assign_task_to_user(db, user_id: str, task_id: ObjectId):
         })
     else:
         # Append to existing tasks
-        print("📝 Updating existing assignment document...")
+        logger.debug("📝 Updating existing assignment document...")
         await db.assignments.update_one(
             {"userId": user_id},
             {
@@ -225,7 +297,12 @@ async def assign_task_to_user(db, user_id: str, task_id: ObjectId):
             }
         )
     
-    print(f"✅ Task {task_id} assigned successfully.")
+    snapshot = _snapshot_for(user_id)
+    if snapshot is not None and snapshot["assigned_ids"] is not None:
+        snapshot["assigned_ids"] = snapshot["assigned_ids"] | {str(task_id)}
+        snapshot["assigned_titles"] = None
+    
+    logger.info("✅ Task %s assigned successfully.", task_id)
     return True
 
 async def update_buddy_status(db, user_id: str, status: str, next_contact: datetime = None):
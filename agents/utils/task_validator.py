@@ -1,4 +1,151 @@
-from bson import ObjectId
+import asyncio
+import logging
+from contextvars import ContextVar
+
+from ..config.settings import Config
+from .study_buddy_helper import get_assigned_task_ids
+
+
+logger = logging.getLogger(__name__)
+
+
+# Per-request record of what fetch_candidate_tasks read in task-assignment mode:
+# {"user_id", "projects": {project_id: name} or None, "tasks": {project_id: [task_id]}}.
+# A ContextVar so concurrent requests each keep their own.
+_task_universe = ContextVar("task_universe", default=None)
+
+
+def start_task_universe(user_id: str):
+    """Begin recording candidate reads for this request (call before fetching them)."""
+    _task_universe.set({"user_id": user_id, "projects": None, "tasks": {}})
+
+
+def record_assigned_projects(user_id: str, project_names: dict):
+    """Record {project_id: name} for every assigned project."""
+    universe = _task_universe.get()
+    if universe is not None and universe["user_id"] == user_id:
+        universe["projects"] = project_names
+
+
+def record_project_tasks(project_id: str, task_ids: list):
+    """Record the ids of all of a project's tasks."""
+    universe = _task_universe.get()
+    if universe is not None:
+        universe["tasks"][project_id] = task_ids
+
+
+def _universe_is_complete(universe, user_id: str) -> bool:
+    return (
+        universe is not None
+        and universe["user_id"] == user_id
+        and universe["projects"] is not None
+        and all(pid in universe["tasks"] for pid in universe["projects"])
+    )
+
+
+async def _fetch_assigned_project_rows(db, user_id: str) -> list:
+    """
+    The user's assigned projects with their names and tasks, joined
+    server-side in one aggregation over assignedprojects.
+
+    Returns:
+        list: [{"projectId", "name", "tasks": [{"_id", "name", "description"}]}],
+        each project's tasks in name order
+    """
+    pipeline = [
+        {"$match": {"userId": user_id, "projectId": {"$nin": [None, ""]}}},
+        {"$project": {
+            "_id": 0,
+            "projectId": 1,
+            # Stored as a string; invalid ids simply find no project
+            "projectOid": {"$convert": {"input": "$projectId", "to": "objectId", "onError": None}},
+        }},
+        # Sub-pipelines project inside the join, so only the fields used
+        # here are copied into each row (not whole project/task documents)
+        {"$lookup": {
+            "from": "projects",
+            "let": {"projectOid": "$projectOid"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$projectOid"]}}},
+                {"$project": {"_id": 0, "name": 1}},
+            ],
+            "as": "project",
+        }},
+        {"$lookup": {
+            "from": "tasks",
+            "let": {"projectId": "$projectId"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$project_id", "$$projectId"]}}},
+                {"$project": {"name": 1, "description": 1}},
+                {"$sort": {"name": 1}},
+            ],
+            "as": "tasks",
+        }},
+        {"$project": {
+            "projectId": 1,
+            "name": {"$arrayElemAt": ["$project.name", 0]},
+            "tasks": 1,
+        }},
+    ]
+    return await db.assignedprojects.aggregate(pipeline).to_list(length=None)
+
+
+def _index_project_rows(rows: list) -> tuple:
+    """
+    Returns:
+        tuple: ([project_id], {project_id: name}, {project_id: [task_id]})
+    """
+    project_ids = [str(row["projectId"]) for row in rows]
+    project_names = {
+        str(row["projectId"]): row["name"] for row in rows if row.get("name")
+    }
+    tasks_by_project = {
+        str(row["projectId"]): [str(task["_id"]) for task in row.get("tasks", [])]
+        for row in rows
+    }
+    return project_ids, project_names, tasks_by_project
+
+
+async def fetch_candidate_tasks(db, user_id: str) -> list:
+    """
+    Tasks from the user's assigned projects that they don't have yet, for
+    the task-assignment ranking prompt: the first
+    Config.TASK_CANDIDATES_PER_PROJECT of each project, in title order.
+    Every project and task id read here (not just the candidates) is
+    recorded in the task universe, so validation doesn't read them again.
+
+    Returns:
+        list: [{"id", "title", "description", "project_name"}]
+    """
+    rows, assigned_ids = await asyncio.gather(
+        _fetch_assigned_project_rows(db, user_id),
+        get_assigned_task_ids(db, user_id),
+    )
+    project_ids, project_names, tasks_by_project = _index_project_rows(rows)
+    
+    record_assigned_projects(user_id, {
+        project_id: project_names.get(project_id, "Unknown") for project_id in project_ids
+    })
+    for project_id, task_ids in tasks_by_project.items():
+        record_project_tasks(project_id, task_ids)
+    
+    per_project = Config.TASK_CANDIDATES_PER_PROJECT
+    candidates = []
+    for row in rows:
+        unassigned = [task for task in row.get("tasks", []) if str(task["_id"]) not in assigned_ids]
+        candidates.extend(
+            {
+                "id": str(task["_id"]),
+                "title": task.get("name") or "Unnamed Task",
+                "description": task.get("description") or "",
+                "project_name": row.get("name") or "Unknown Project",
+            }
+            for task in unassigned[:per_project]
+        )
+    logger.debug(
+        "📦 %d candidate tasks across %d assigned projects", len(candidates), len(project_ids)
+    )
+    return candidates
 
 
 async def validate_and_enrich_tasks(db, user_id: str, parsed_tasks: list) -> tuple:
@@ -8,92 +155,92 @@ async def validate_and_enrich_tasks(db, user_id: str, parsed_tasks: list) -> tup
     Returns:
         tuple: (enriched_tasks, validation_summary)
     """
-    print(f"\n{'='*60}")
-    print(f"🛡️ SERVER-SIDE VALIDATION")
-    print(f"{'='*60}")
+    logger.debug("🛡️ SERVER-SIDE VALIDATION for user: %s", user_id)
     
-    # Get all tasks from assigned projects for validation
-    assigned_projects_cursor = db.assignedprojects.find({"userId": user_id})
-    assigned_projects = await assigned_projects_cursor.to_list(length=None)
+    if not parsed_tasks:
+        # Nothing suggested: no projects, tasks or assignment to read
+        logger.info("📤 No tasks suggested; nothing to validate")
+        return [], {"total_suggested": 0, "valid": 0, "hallucinated": 0, "final": 0}
+    
+    universe = _task_universe.get()
+    if _universe_is_complete(universe, user_id):
+        # Every assigned project and its tasks were already read this turn
+        # (candidate fetch or the agent's tools); only the assignment is left
+        logger.debug("♻️ Reusing projects/tasks fetched earlier this turn")
+        project_ids = list(universe["projects"])
+        project_names = universe["projects"]
+        tasks_by_project = universe["tasks"]
+        assigned_ids = await get_assigned_task_ids(db, user_id)
+    else:
+        # Get all tasks from assigned projects for validation; the user's
+        # assigned task ids (for the duplicate check below) are read alongside
+        rows, assigned_ids = await asyncio.gather(
+            _fetch_assigned_project_rows(db, user_id),
+            get_assigned_task_ids(db, user_id),
+        )
+        project_ids, project_names, tasks_by_project = _index_project_rows(rows)
     
     valid_task_ids = set()
     project_info = {}
     
-    for ap in assigned_projects:
-        project_id = ap.get("projectId")
-        project_tasks_cursor = db.tasks.find({"project_id": project_id})
-        project_tasks = await project_tasks_cursor.to_list(length=None)
-        
-        # Get project details
-        project = await db.projects.find_one({"_id": ObjectId(project_id)})
-        project_name = project.get("name", "Unknown") if project else "Unknown"
+    for project_id in project_ids:
+        project_name = project_names.get(str(project_id), "Unknown")
         
-        for task in project_tasks:
-            task_id = str(task["_id"])
+        for task_id in tasks_by_project.get(project_id, []):
             valid_task_ids.add(task_id)
             project_info[task_id] = {
                 "project_id": project_id,
                 "project_name": project_name
             }
     
-    print(f"\n📦 Total valid tasks across all assigned projects: {len(valid_task_ids)}")
-    print(f"🔍 Validating {len(parsed_tasks)} suggested tasks...\n")
+    logger.debug(
+        "📦 %d valid tasks across assigned projects; validating %d suggested tasks",
+        len(valid_task_ids), len(parsed_tasks)
+    )
     
-    # Filter out hallucinated tasks
-    validated_tasks = []
+    # One pass over the suggestions: drop hallucinated ids, drop tasks the
+    # user already has, and enrich the rest with project information
+    enriched_tasks = []
     hallucinated_tasks = []
+    duplicate_count = 0
     
     for task in parsed_tasks:
         task_id = str(task.get("id", ""))
-        if task_id in valid_task_ids:
-            validated_tasks.append(task)
-            print(f"✅ VALID: {task.get('title')} (ID: {task_id})")
-        else:
+        if task_id not in valid_task_ids:
             hallucinated_tasks.append(task)
-            print(f"❌ INVALID/HALLUCINATED: {task.get('title')} (ID: {task_id})")
+        elif task_id in assigned_ids:
+            duplicate_count += 1
+        else:
+            proj_info = project_info[task_id]
+            enriched_tasks.append({
+                "taskId": task_id,
+                "taskName": task.get("title"),
+                "projectId": proj_info["project_id"],
+                "projectName": proj_info["project_name"],
+            })
     
     if hallucinated_tasks:
-        print(f"\n⚠️ WARNING: LLM hallucinated {len(hallucinated_tasks)} tasks!")
-        print(f"   Filtered them out. Using only {len(validated_tasks)} valid tasks.")
+        logger.warning(
+            "⚠️ LLM hallucinated %d tasks; using only %d valid tasks",
+            len(hallucinated_tasks), len(parsed_tasks) - len(hallucinated_tasks)
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\n".join(
+                f"❌ INVALID/HALLUCINATED: {task.get('title')} (ID: {task.get('id')})" for task in hallucinated_tasks
+            ))
     
-    # Check for duplicates with assigned tasks
-    assignment = await db.assignments.find_one({"userId": user_id})
-    if assignment and assignment.get("tasks"):
-        assigned_ids = {str(t.get("taskId")) for t in assignment.get("tasks", []) if t.get("taskId")}
-        
-        print(f"\n🚫 Checking for duplicates with {len(assigned_ids)} assigned tasks...")
-        
-        original_count = len(validated_tasks)
-        validated_tasks = [
-            task for task in validated_tasks 
-            if str(task.get("id")) not in assigned_ids
-        ]
-        
-        if original_count != len(validated_tasks):
-            print(f"⚠️ Removed {original_count - len(validated_tasks)} duplicate tasks")
-    
-    print(f"\n✅ Final validated tasks: {len(validated_tasks)}")
-    print(f"{'='*60}\n")
+    if duplicate_count:
+        logger.debug("⚠️ Removed %d tasks already assigned to the user", duplicate_count)
 
-    # Enrich tasks with project information
-    enriched_tasks = []
-    for task in validated_tasks:
-        task_id = task.get("id")
-        proj_info = project_info.get(task_id, {})
-        enriched_task = {
-            "taskId": task_id,
-            "taskName": task.get("title"),
-            "projectId": proj_info.get("project_id", ""),
-            "projectName": proj_info.get("project_name", "Unknown Project"),
-        }
-        enriched_tasks.append(enriched_task)
-        print(f"   ✓ {enriched_task['taskName']} (Project: {enriched_task['projectName']})")
-
-    print(f"\n📤 Returning {len(enriched_tasks)} validated tasks\n")
+    if enriched_tasks and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("\n".join(
+            f"   ✓ {t['taskName']} (Project: {t['projectName']})" for t in enriched_tasks
+        ))
+    logger.info("📤 Returning %d validated tasks", len(enriched_tasks))
     
     return enriched_tasks, {
         "total_suggested": len(parsed_tasks),
-        "valid": len(validated_tasks),
+        "valid": len(enriched_tasks),
         "hallucinated": len(hallucinated_tasks),
         "final": len(enriched_tasks)
     }
@@ -104,10 +251,10 @@ def format_tasks_message(enriched_tasks: list) -> str:
     if len(enriched_tasks) == 0:
         return "Looks like your Study Plan has not been prepared as yet. Please connect with Vijender asap."
     
-    message_text = f"I've selected {len(enriched_tasks)} personalized tasks for your learning path:\n\n"
-    for idx, task in enumerate(enriched_tasks, 1):
-        message_text += f"{idx}. *{task['taskName']}*\n"
-        message_text += f"   Project: {task['projectName']}\n"
-        message_text += f"   Task ID: {task['taskId']}\n\n"
-    
-    return message_text
+    header = f"I've selected {len(enriched_tasks)} personalized tasks for your learning path:\n\n"
+    return header + "".join(
+        f"{idx}. *{task['taskName']}*\n"
+        f"   Project: {task['projectName']}\n"
+        f"   Task ID: {task['taskId']}\n\n"
+        for idx, task in enumerate(enriched_tasks, 1)
+    )
@@ -1,10 +1,17 @@
 # tools.py
 
 from langchain_core.tools import tool
-from bson import ObjectId
 import httpx
 from datetime import datetime, timedelta
 import json
+import logging
+
+from ..config.settings import Config
+from .object_ids import to_object_id
+from .user_profile import summarize_profile
+
+
+logger = logging.getLogger(__name__)
 
 
 def create_agent_tools(db):
@@ -14,81 +21,103 @@ def create_agent_tools(db):
     async def get_user_goals(user_id: str) -> str:
         """Fetch the user's current learning goals from the database."""
         try:
-            print(f"\n🎯 Fetching goals for user: {user_id}")
-            user_doc = await db.users.find_one({"userId": user_id})
+            logger.debug("🎯 Fetching goals for user: %s", user_id)
+            user_doc = await db.users.find_one({"userId": user_id}, {"goals": 1})
             
             if user_doc and "goals" in user_doc:
                 goals = user_doc["goals"]
-                print(f"✅ Found goals: {goals}")
+                logger.debug("✅ Found goals: %s", goals)
                 return f"User's learning goals: {goals}"
             else:
-                print("⚠️ No goals found for user")
+                logger.debug("⚠️ No goals found for user")
                 return "No learning goals set yet. User should update their goals first."
         except Exception as e:
-            print(f"❌ Error fetching goals: {str(e)}")
+            logger.exception("❌ Error fetching goals: %s", e)
             return f"Error fetching goals: {str(e)}"
 
     @tool
     async def get_assigned_projects(user_id: str) -> str:
         """Get list of projects assigned to the user with project IDs and names."""
         try:
-            print(f"\n📚 Fetching assigned projects for user: {user_id}")
+            logger.debug("📚 Fetching assigned projects for user: %s", user_id)
             
-            assigned_projects_cursor = db.assignedprojects.find({"userId": user_id})
+            assigned_projects_cursor = db.assignedprojects.find(
+                {"userId": user_id}, {"_id": 0, "projectId": 1}
+            )
             assigned_projects = await assigned_projects_cursor.to_list(length=None)
             
             if not assigned_projects:
-                print("⚠️ No projects assigned to user")
+                logger.debug("⚠️ No projects assigned to user")
                 return "No projects assigned to this user yet."
             
+            # Convert/validate each id once and fetch all projects in one query
+            project_oids = [
+                (ap["projectId"], to_object_id(ap["projectId"]))
+                for ap in assigned_projects
+                if ap.get("projectId") and to_object_id(ap["projectId"])
+            ]
+            projects_cursor = db.projects.find(
+                {"_id": {"$in": [oid for _, oid in project_oids]}}, {"name": 1}
+            )
+            projects_by_oid = {
+                p["_id"]: p for p in await projects_cursor.to_list(length=None)
+            }
+
             project_list = []
-            for ap in assigned_projects:
-                project_id = ap.get("projectId")
-                project = await db.projects.find_one({"_id": ObjectId(project_id)})
+            for project_id, project_oid in project_oids:
+                project = projects_by_oid.get(project_oid)
                 
                 if project:
                     project_name = project.get("name", "Unknown Project")
                     project_list.append(f"Project ID: {project_id}, Name: {project_name}")
-                    print(f"   ✅ {project_name} (ID: {project_id})")
             
-            print(f"✅ Found {len(project_list)} assigned projects")
+            logger.debug("✅ Found %d assigned projects", len(project_list))
+            if project_list and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("\n".join(f"   ✅ {line}" for line in project_list))
             return "Assigned projects:\n" + "\n".join(project_list)
             
         except Exception as e:
-            print(f"❌ Error fetching assigned projects: {str(e)}")
+            logger.exception("❌ Error fetching assigned projects: %s", e)
             return f"Error fetching assigned projects: {str(e)}"
 
     @tool
     async def get_tasks_for_project(project_id: str) -> str:
         """Get all tasks for a specific project. Returns task IDs and names."""
         try:
-            print(f"\n📋 Fetching tasks for project: {project_id}")
+            logger.debug("📋 Fetching tasks for project: %s", project_id)
             
-            tasks_cursor = db.tasks.find({"project_id": project_id})
+            tasks_cursor = db.tasks.find(
+                {"project_id": project_id}, {"name": 1, "description": 1}
+            )
             tasks = await tasks_cursor.to_list(length=None)
             
             if not tasks:
-                print(f"⚠️ No tasks found for project {project_id}")
+                logger.debug("⚠️ No tasks found for project %s", project_id)
                 return f"No tasks found for project {project_id}"
             
             task_list = []
             for task in tasks:
                 task_id = str(task["_id"])
                 task_name = task.get("name", "Unnamed Task")
-                task_desc = task.get("description", "No description")
+                task_desc = task.get("description") or "No description"
+                if len(task_desc) > Config.TOOL_DESCRIPTION_MAX_CHARS:
+                    task_desc = task_desc[:Config.TOOL_DESCRIPTION_MAX_CHARS].rstrip() + "..."
                 
                 task_list.append(
                     f"Task ID: {task_id}\n"
                     f"Name: {task_name}\n"
                     f"Description: {task_desc}\n"
                 )
-                print(f"   ✅ {task_name} (ID: {task_id})")
             
-            print(f"✅ Found {len(task_list)} tasks")
+            logger.debug("✅ Found %d tasks", len(task_list))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("\n".join(
+                    f"   ✅ {task.get('name', 'Unnamed Task')} (ID: {task['_id']})" for task in tasks
+                ))
             return f"Tasks for project {project_id}:\n\n" + "\n".join(task_list)
             
         except Exception as e:
-            print(f"❌ Error fetching tasks: {str(e)}")
+            logger.exception("❌ Error fetching tasks: %s", e)
             return f"Error fetching tasks for project {project_id}: {str(e)}"
 
     @tool
@@ -105,17 +134,22 @@ def create_agent_tools(db):
             Formatted chat history with timestamps
         """
         try:
-            print(f"\n💬 Fetching chat history for user: {user_id} (limit: {limit})")
-            
-            chat_history_cursor = db.chats.find(
-                {"userId": user_id}
-            ).sort("timestamp", -1).limit(limit)
+            logger.debug("💬 Fetching chat history for user: %s (limit: %d)", user_id, limit)
+            
+            # Newest `limit` messages, re-sorted ascending on the server so
+            # they arrive in chronological order
+            chat_history_cursor = db.chats.aggregate([
+                {"$match": {"userId": user_id}},
+                {"$sort": {"timestamp": -1}},
+                {"$limit": limit},
+                {"$sort": {"timestamp": 1}},
+                {"$project": {"_id": 0, "userType": 1, "message": 1}},
+            ])
             
             chat_history = await chat_history_cursor.to_list(length=limit)
-            chat_history.reverse()  # Reverse to get chronological order
             
             if not chat_history:
-                print("⚠️ No chat history found")
+                logger.debug("⚠️ No chat history found")
                 return "No previous chat history found for this user."
             
             # Format chat history
@@ -123,20 +157,17 @@ def create_agent_tools(db):
             for chat in chat_history:
                 user_type = chat.get("userType", "unknown")
                 message = chat.get("message", "")
-                timestamp = chat.get("timestamp", "")
                 
                 formatted_history.append(f"{user_type.upper()}: {message}")
             
             history_text = "\n".join(formatted_history)
-            print(f"✅ Retrieved {len(chat_history)} chat messages")
-            print(f"📜 Chat history:\n{history_text}\n")
+            logger.debug("✅ Retrieved %d chat messages", len(chat_history))
+            logger.debug("📜 Chat history:\n%s", history_text)
             
             return f"Chat history for user {user_id}:\n\n{history_text}"
             
         except Exception as e:
-            print(f"❌ Error fetching chat history: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error fetching chat history: %s", e)
             return f"Error fetching chat history: {str(e)}"
 
     @tool
@@ -153,10 +184,9 @@ def create_agent_tools(db):
             Success or error message
         """
         try:
-            print(f"\n💾 Saving chat to history...")
-            print(f"   User ID: {user_id}")
-            print(f"   User Type: {user_type}")
-            print(f"   Message: {message[:100]}...")  # Log first 100 chars
+            logger.debug(
+                "💾 Saving %s chat for user %s: %.100s", user_type, user_id, message
+            )
             
             # Insert chat document into database
             chat_doc = {
@@ -168,13 +198,11 @@ def create_agent_tools(db):
             
             result = await db.chats.insert_one(chat_doc)
             
-            print(f"✅ Chat saved successfully with ID: {result.inserted_id}")
+            logger.debug("✅ Chat saved successfully with ID: %s", result.inserted_id)
             return f"Chat saved successfully for user {user_id}"
             
         except Exception as e:
-            print(f"❌ Error saving chat: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error saving chat: %s", e)
             return f"Error saving chat: {str(e)}"
 
     @tool
@@ -191,16 +219,8 @@ def create_agent_tools(db):
             Success or error message
         """
         try:
-            print(f"\n📄 Saving resume data for user: {user_id}")
-            print(f"📊 Resume data keys: {list(resume_data.keys())}")
-            
-            # Create userdata document
-            userdata_doc = {
-                "userId": user_id,
-                "resumeData": resume_data,
-                "uploadedAt": datetime.now(),
-                "lastUpdated": datetime.now()
-            }
+            logger.debug("📄 Saving resume data for user: %s", user_id)
+            logger.debug("📊 Resume data keys: %s", resume_data.keys())
             
             # Upsert: update if exists, insert if doesn't
             result = await db.userdata.update_one(
@@ -208,7 +228,10 @@ def create_agent_tools(db):
                 {
                     "$set": {
                         "resumeData": resume_data,
-                        "lastUpdated": datetime.now()
+                        "profileDigest": summarize_profile(resume_data)
+                    },
+                    "$currentDate": {
+                        "lastUpdated": True
                     },
                     "$setOnInsert": {
                         "uploadedAt": datetime.now()
@@ -218,23 +241,85 @@ def create_agent_tools(db):
             )
             
             if result.upserted_id:
-                print(f"✅ New resume data inserted with ID: {result.upserted_id}")
+                logger.info("✅ New resume data inserted with ID: %s", result.upserted_id)
                 action = "saved"
             elif result.modified_count > 0:
-                print(f"✅ Existing resume data updated")
+                logger.info("✅ Existing resume data updated for user: %s", user_id)
                 action = "updated"
             else:
-                print(f"⚠️ No changes made to resume data")
+                logger.debug("⚠️ No changes made to resume data")
                 action = "verified"
             
             return f"Resume data {action} successfully for user {user_id}"
             
         except Exception as e:
-            print(f"❌ Error saving resume data: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error saving resume data: %s", e)
             return f"Error saving resume data: {str(e)}"
 
+    @tool
+    async def save_user_profile(
+        user_id: str,
+        about: str = "Not provided",
+        interests: str = "Not provided",
+        careerGoals: str = "Not provided",
+        currentRole: str = "Not provided",
+        skills: str = "Not provided",
+        experience: str = "Not provided"
+    ) -> str:
+        """
+        Save what the user told you about themselves to the userdata collection.
+        Call this once when the user describes their background, interests or
+        career goals and no profile or resume is stored for them yet.
+
+        Args:
+            user_id: The user's ID
+            about: Brief summary of the person
+            interests: What excites them or what they're interested in
+            careerGoals: Their career aspirations and goals
+            currentRole: Their current job/role if mentioned
+            skills: Any skills they mentioned
+            experience: Years of experience or background mentioned
+
+        Returns:
+            Success or error message
+        """
+        try:
+            logger.debug("📝 Saving user profile for user: %s", user_id)
+
+            profile = {
+                "about": about,
+                "interests": interests,
+                "careerGoals": careerGoals,
+                "currentRole": currentRole,
+                "skills": skills,
+                "experience": experience
+            }
+
+            await db.userdata.update_one(
+                {"userId": user_id},
+                {
+                    "$set": {
+                        "resumeData": profile,
+                        "profileDigest": summarize_profile(profile),
+                        "dataSource": "text_input"
+                    },
+                    "$currentDate": {
+                        "lastUpdated": True
+                    },
+                    "$setOnInsert": {
+                        "uploadedAt": datetime.now()
+                    }
+                },
+                upsert=True
+            )
+
+            logger.info("✅ User profile saved for user: %s", user_id)
+            return f"Profile saved successfully for user {user_id}"
+
+        except Exception as e:
+            logger.exception("❌ Error saving user profile: %s", e)
+            return f"Error saving user profile: {str(e)}"
+
     @tool
     async def get_resume_data(user_id: str) -> str:
         """
@@ -248,18 +333,20 @@ def create_agent_tools(db):
             Resume data or error message
         """
         try:
-            print(f"\n📄 Fetching resume data for user: {user_id}")
+            logger.debug("📄 Fetching resume data for user: %s", user_id)
             
-            userdata = await db.userdata.find_one({"userId": user_id})
+            userdata = await db.userdata.find_one(
+                {"userId": user_id}, {"resumeData": 1, "uploadedAt": 1}
+            )
             
             if not userdata or "resumeData" not in userdata:
-                print("⚠️ No resume data found")
+                logger.debug("⚠️ No resume data found")
                 return "No resume data found for this user. User should upload their resume first."
             
             resume_data = userdata["resumeData"]
             uploaded_at = userdata.get("uploadedAt", "Unknown")
             
-            print(f"✅ Found resume data (uploaded: {uploaded_at})")
+            logger.debug("✅ Found resume data (uploaded: %s)", uploaded_at)
             
             # Format resume data for the agent
             import json
@@ -268,9 +355,7 @@ def create_agent_tools(db):
             return f"Resume data for user {user_id}:\n\n{formatted_data}"
             
         except Exception as e:
-            print(f"❌ Error fetching resume data: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error fetching resume data: %s", e)
             return f"Error fetching resume data: {str(e)}"
 
     @tool
@@ -305,7 +390,10 @@ def create_agent_tools(db):
         """
         try:
             from .study_buddy_helper import assign_task_to_user
-            success = await assign_task_to_user(db, user_id, ObjectId(task_id))
+            task_oid = to_object_id(task_id)
+            if not task_oid:
+                return f"Error assigning task: invalid task id {task_id}"
+            success = await assign_task_to_user(db, user_id, task_oid)
             if success:
                 return "Task assigned successfully to user dashboard."
             return "Failed to assign task."
@@ -333,6 +421,7 @@ def create_agent_tools(db):
         get_chat_history, 
         save_chat_history,
         save_resume_data,
+        save_user_profile,
         get_resume_data,
         get_first_task_by_skill,
         assign_task_to_user_tool,
@@ -0,0 +1,53 @@
+# user_profile.py
+
+PROFILE_DIGEST_MAX_WORDS = 50
+PROFILE_DIGEST_TOP_SKILLS = 3
+
+_MISSING = ("", "not provided", "none", "n/a")
+
+
+def _as_text(value) -> str:
+    """Flatten a resume field (str, list, dict) into plain text."""
+    if isinstance(value, dict):
+        return str(value.get("name") or value.get("title") or ", ".join(
+            _as_text(v) for v in value.values() if v
+        ))
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_as_text(v) for v in value if v)
+    return str(value).strip()
+
+
+def _top_skills(skills) -> list:
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    if not isinstance(skills, (list, tuple)):
+        return []
+    names = [_as_text(skill) for skill in skills]
+    return [name for name in names if name.lower() not in _MISSING][:PROFILE_DIGEST_TOP_SKILLS]
+
+
+def summarize_profile(profile: dict) -> str:
+    """
+    Compact (~50 word) digest of a stored profile or parsed resume:
+    current role, career goals and top skills.
+
+    Used in prompts instead of the full JSON; the agent can still call
+    get_resume_data when it needs the details.
+    """
+    if not isinstance(profile, dict):
+        return ""
+
+    parts = []
+    for label, key in (("Role", "currentRole"), ("Goals", "careerGoals"), ("Interests", "interests")):
+        text = _as_text(profile.get(key) or "")
+        if text.lower() not in _MISSING:
+            parts.append(f"{label}: {text}")
+
+    skills = _top_skills(profile.get("skills"))
+    if skills:
+        parts.append(f"Top skills: {', '.join(skills)}")
+
+    words = "; ".join(parts).split()
+    if len(words) > PROFILE_DIGEST_MAX_WORDS:
+        words = words[:PROFILE_DIGEST_MAX_WORDS] + ["..."]
+    return " ".join(words)
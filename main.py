@@ -1,7 +1,10 @@
 import os
 import sys
+import atexit
 import logging
 import asyncio
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from fastapi import FastAPI, Request, Header, HTTPException, Depends
 from fastapi.responses import JSONResponse
@@ -10,33 +13,70 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+# Records are formatted by the QueueHandler and written to stdout by a
+# listener thread, so logging calls never block the event loop on I/O
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)]
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger("project-school")
 
 from routers import projects, chat, goals, tasks, assignedprojects, preferences, quizzes, assessments, projectschool, me
 from agents.learning_agent import get_learning_agent
+from agents.agent_conversation import close_whatsapp_client
 
 load_dotenv()
 
+# Connection pool sizing for a single-process asyncio service: a small warm
+# pool (no cold TCP/TLS/auth on the first requests), idle connections
+# trimmed after a minute, and fast failure instead of piling up waiters
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": 20,
+    "minPoolSize": 5,
+    "maxIdleTimeMS": 60000,
+    "serverSelectionTimeoutMS": 3000,
+    "waitQueueTimeoutMS": 2000,
+}
+
+# (collection, keys, options) for every index the hot query paths rely on.
+# chats {userId, timestamp} also serves the newest-first history sort.
+DB_INDEXES = [
+    ("chats", [("userId", 1), ("timestamp", 1)], {}),
+    ("agents", [("userId", 1)], {"unique": True}),
+    ("resources", [("taskId", 1)], {}),
+    ("resources", [("projectId", 1)], {}),
+    ("resources", [("userId", 1)], {}),
+    ("resources", [("name", 1)], {}),
+    ("assignedprojects", [("userId", 1)], {}),
+    ("assignedprojects", [("userId", 1), ("sequenceId", 1)], {}),
+    ("preferences", [("userId", 1)], {"unique": True}),
+    ("assignments", [("userId", 1), ("tasks.taskStatus", 1)], {}),
+    ("goals", [("userId", 1)], {}),
+    ("userdata", [("userId", 1)], {}),
+    ("tasks", [("project_id", 1)], {}),
+    # Skill lookup's natural title order (study_buddy_helper.TITLE_COLLATION)
+    ("tasks", [("project_id", 1), ("title", 1)],
+     {"collation": {"locale": "en", "numericOrdering": True}}),
+]
+
 async def create_db_indexes(db):
     logger.info("🔧 Starting index creation...")
-    try:
-        await db.chats.create_index([("userId", 1), ("timestamp", 1)])
-        await db.agents.create_index([("userId", 1)], unique=True)
-        await db.resources.create_index([("taskId", 1)])
-        await db.resources.create_index([("projectId", 1)])
-        await db.resources.create_index([("userId", 1)])
-        await db.resources.create_index([("name", 1)])
-        await db.assignedprojects.create_index([("userId", 1)])
-        await db.assignedprojects.create_index([("userId", 1), ("sequenceId", 1)])
-        await db.preferences.create_index([("userId", 1)], unique=True)
+    failed = 0
+    for collection, keys, options in DB_INDEXES:
+        # create_index is idempotent; one failure (e.g. a unique index over
+        # existing duplicates) shouldn't stop the remaining indexes
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception as e:
+            failed += 1
+            logger.warning(f"⚠️ Index creation notice for {collection} {keys}: {str(e)}")
+    if not failed:
         logger.info("✅ All indexes verified/created")
-    except Exception as e:
-        logger.warning(f"⚠️ Index creation notice: {str(e)}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -48,11 +88,12 @@ async def lifespan(app: FastAPI):
 
     try:
         logger.info(f"🔌 Connecting to MongoDB: {mongodb_url[:20]}...")
-        client = AsyncIOMotorClient(mongodb_url)
+        client = AsyncIOMotorClient(mongodb_url, **MONGO_CLIENT_OPTIONS)
         await client.admin.command('ping')
         db = client[db_name]
         app.state.db = db
         logger.info(f"✅ Connected to database: {db_name}")
+        await create_db_indexes(db)
         app.state.agent = get_learning_agent(db)
     except Exception as e:
         logger.error(f"Critical error during startup: {str(e)}")
@@ -66,7 +107,9 @@ async def lifespan(app: FastAPI):
         try:
             log_url = main_mongodb_url.split('@')[-1] if '@' in main_mongodb_url else main_mongodb_url[:20]
             logger.info(f"🔌 Connecting to Main MongoDB: {log_url}...")
-            main_client = AsyncIOMotorClient(main_mongodb_url, serverSelectionTimeoutMS=5000)
+            main_client = AsyncIOMotorClient(
+                main_mongodb_url, **{**MONGO_CLIENT_OPTIONS, "serverSelectionTimeoutMS": 5000}
+            )
             await main_client.admin.command('ping')
             app.state.main_db = main_client.get_default_database()
         except Exception as e:
@@ -85,6 +128,8 @@ async def lifespan(app: FastAPI):
         main_client.close()
         logger.info("🔌 Main Database connection closed")
 
+    await close_whatsapp_client()
+
 app = FastAPI(title="Project + Agentic AI API", lifespan=lifespan, redirect_slashes=False)
 
 # ============================================================================
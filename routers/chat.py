@@ -1,15 +1,19 @@
 # chat.py
 
+import logging
+
 from fastapi import APIRouter, Request, Body, HTTPException
 from datetime import datetime
 from models import Chat
-from agents.learning_agent import run_learning_agent, handle_agent_name_update
+from agents.learning_agent import run_learning_agent, handle_agent_name_update, remember_agent_name
 from bson import ObjectId
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from agents.agent_conversation import check_and_send_task_reminders
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 
 class AgentRequest(BaseModel):
     """Request model for agent endpoint with optional resume data"""
@@ -50,15 +54,15 @@ async def chat_with_agent(request: Request, agent_req: AgentRequest = Body(...))
     message = agent_req.message
     resume_data = agent_req.resumeData  # ← NEW: Get resume data from request
 
-    print(f"🚀 Agent invoked for user: {user_id}")
+    logger.info("🚀 Agent invoked for user: %s", user_id)
     if message:
-        print(f"💬 With message: {message}")
+        logger.debug("💬 With message: %s", message)
     if resume_data:
-        print(f"📄 With resume data: {list(resume_data.keys())}")
+        logger.debug("📄 With resume data: %s", list(resume_data))
 
     try:
         # Regular learning agent invocation with optional message and resume data
-        print("⚙️ Running learning agent...")
+        logger.debug("⚙️ Running learning agent...")
         result = await run_learning_agent(db, user_id, message, resume_data)  # ← UPDATED: Pass resume_data
         
         agent_response = result.get("message", "I couldn't process your request.")
@@ -69,13 +73,11 @@ async def chat_with_agent(request: Request, agent_req: AgentRequest = Body(...))
         buttons = result.get("buttons", [])
         skip_save = result.get("skip_save", False)
         
-        print(f"✅ Retrieved {len(tasks)} tasks and {len(buttons)} buttons from agent result")
-        print(f"✅ Agent completed with status: {status}")
+        logger.debug("✅ Retrieved %d tasks and %d buttons from agent result", len(tasks), len(buttons))
+        logger.info("✅ Agent completed with status: %s", status)
         
     except Exception as e:
-        print(f"❌ Agent Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Agent Error: %s", e)
         agent_response = f"An error occurred: {str(e)}"
         status = "error"
         tasks = []
@@ -92,7 +94,7 @@ async def chat_with_agent(request: Request, agent_req: AgentRequest = Body(...))
         }
 
         result = await db.chats.insert_one(agent_chat_doc)
-        print(f"💾 Stored agent response in chat history")
+        logger.debug("💾 Stored agent response in chat history")
 
         created_chat = await db.chats.find_one({"_id": result.inserted_id})
         
@@ -104,7 +106,7 @@ async def chat_with_agent(request: Request, agent_req: AgentRequest = Body(...))
             "status": status
         }
     else:
-        print(f"⏭️ Skipping chat save (already handled in agent)")
+        logger.debug("⏭️ Skipping chat save (already handled in agent)")
         # Return response without saving again
         return {
             "userId": user_id,
@@ -132,14 +134,14 @@ async def clear_chat_history(request: Request, user_id: str):
     """
     db = request.app.state.db
 
-    print(f"🗑️ Clearing chat history for user: {user_id}")
+    logger.info("🗑️ Clearing chat history for user: %s", user_id)
 
     try:
         # Delete all chat documents for this user
         result = await db.chats.delete_many({"userId": user_id})
         
         deleted_count = result.deleted_count
-        print(f"✅ Deleted {deleted_count} chat messages")
+        logger.info("✅ Deleted %d chat messages", deleted_count)
         
         return {
             "status": "success",
@@ -148,12 +150,22 @@ async def clear_chat_history(request: Request, user_id: str):
         }
     
     except Exception as e:
-        print(f"❌ Error clearing chat history: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error clearing chat history: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to clear chat history: {str(e)}")
     
 
+async def _log_known_agents(db):
+    """Debug aid: log a sample of the userIds stored in the agents collection."""
+    all_agents_count = await db.agents.count_documents({})
+    logger.debug("📊 Total agents in collection: %d", all_agents_count)
+    if all_agents_count > 0:
+        all_agents = await db.agents.find({}, {"userId": 1, "agentName": 1}).to_list(length=10)
+        logger.debug("🔍 Existing agents (userId, agentName): %s", "; ".join(
+            f"{ag.get('userId')!r} ({type(ag.get('userId')).__name__}), {ag.get('agentName')!r}"
+            for ag in all_agents
+        ))
+
+
 @router.post("/manage-agent", status_code=200)
 async def manage_agent(request: Request, agent_req: ManageAgentRequest = Body(...)):
     """
@@ -163,43 +175,24 @@ async def manage_agent(request: Request, agent_req: ManageAgentRequest = Body(..
     user_id = agent_req.userId
     agent_name = agent_req.agentName
 
-    print("=" * 80)
-    print(f"📝 MANAGE AGENT REQUEST")
-    print(f"📍 Received userId: {user_id}")
-    print(f"📍 userId type: {type(user_id)}")
-    print(f"📍 userId length: {len(user_id)}")
-    print(f"📍 Agent name: {agent_name}")
-    print("=" * 80)
+    logger.info("📝 MANAGE AGENT REQUEST userId=%r agentName=%r", user_id, agent_name)
 
     # Validate agent name
     if not agent_name or not agent_name.strip():
         raise HTTPException(status_code=400, detail="Agent name cannot be empty")
 
     # Check for existing agents with this userId
-    print(f"🔍 Searching for existing agent with userId: {user_id}")
-    existing_agent = await db.agents.find_one({"userId": user_id})
-    
-    if existing_agent:
-        print(f"✅ Found existing agent:")
-        print(f"   - _id: {existing_agent.get('_id')}")
-        print(f"   - userId: {existing_agent.get('userId')}")
-        print(f"   - agentName: {existing_agent.get('agentName')}")
-        print(f"   - updated_at: {existing_agent.get('updated_at')}")
-    else:
-        print(f"❌ No existing agent found for userId: {user_id}")
-        
-        # Check if there are any agents at all for debugging
-        all_agents_count = await db.agents.count_documents({})
-        print(f"📊 Total agents in collection: {all_agents_count}")
-        
-        if all_agents_count > 0:
-            print(f"🔍 Checking all existing userIds in agents collection:")
-            all_agents = await db.agents.find({}, {"userId": 1, "agentName": 1}).to_list(length=10)
-            for ag in all_agents:
-                print(f"   - userId: '{ag.get('userId')}' (type: {type(ag.get('userId'))}), agentName: '{ag.get('agentName')}'")
+    # Existing agent lookup is diagnostics only; skip the reads unless debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        existing_agent = await db.agents.find_one({"userId": user_id})
+        if existing_agent:
+            logger.debug("✅ Found existing agent: %s", existing_agent)
+        else:
+            logger.debug("❌ No existing agent found for userId: %s", user_id)
+            await _log_known_agents(db)
 
     # Upsert agent document
-    print(f"💾 Performing upsert for userId: {user_id}")
+    logger.debug("💾 Performing upsert for userId: %s", user_id)
     result = await db.agents.update_one(
         {"userId": user_id},
         {
@@ -213,26 +206,23 @@ async def manage_agent(request: Request, agent_req: ManageAgentRequest = Body(..
         },
         upsert=True
     )
+    remember_agent_name(user_id, agent_name.strip())
 
-    print(f"💾 Upsert result:")
-    print(f"   - matched_count: {result.matched_count}")
-    print(f"   - modified_count: {result.modified_count}")
-    print(f"   - upserted_id: {result.upserted_id}")
+    logger.debug(
+        "💾 Upsert result: matched_count=%s, modified_count=%s, upserted_id=%s",
+        result.matched_count, result.modified_count, result.upserted_id
+    )
 
     # Fetch the updated/created agent
     agent = await db.agents.find_one({"userId": user_id})
     
     if agent:
-        print(f"✅ Final agent state:")
-        print(f"   - _id: {agent.get('_id')}")
-        print(f"   - userId: {agent.get('userId')}")
-        print(f"   - agentName: {agent.get('agentName')}")
+        logger.debug("✅ Final agent state: %s", agent)
     else:
-        print(f"❌ WARNING: Could not retrieve agent after upsert!")
+        logger.error("❌ Could not retrieve agent after upsert for userId: %s", user_id)
     
     action = "updated" if result.modified_count > 0 else "created"
-    print(f"✅ Agent {action} successfully")
-    print("=" * 80)
+    logger.info("✅ Agent %s successfully", action)
     
     return {
         "status": "success",
@@ -249,28 +239,17 @@ async def get_agent(request: Request, agent_req: GetAgentRequest = Body(...)):
     db = request.app.state.db
     user_id = agent_req.userId
 
-    print("=" * 80)
-    print(f"🔍 GET AGENT REQUEST")
-    print(f"📍 Received userId: {user_id}")
-    print(f"📍 userId type: {type(user_id)}")
-    print(f"📍 userId length: {len(user_id)}")
-    print("=" * 80)
+    logger.debug("🔍 GET AGENT REQUEST userId=%r", user_id)
 
     # Find agent document
     agent = await db.agents.find_one({"userId": user_id})
     
     if not agent:
-        print(f"❌ No agent found for userId: {user_id}")
+        logger.debug("❌ No agent found for userId: %s", user_id)
         
         # Debug: show what userIds exist
-        all_agents_count = await db.agents.count_documents({})
-        print(f"📊 Total agents in collection: {all_agents_count}")
-        
-        if all_agents_count > 0:
-            print(f"🔍 Existing userIds in agents collection:")
-            all_agents = await db.agents.find({}, {"userId": 1, "agentName": 1}).to_list(length=10)
-            for ag in all_agents:
-                print(f"   - userId: '{ag.get('userId')}' (type: {type(ag.get('userId'))})")
+        if logger.isEnabledFor(logging.DEBUG):
+            await _log_known_agents(db)
         
         # Return default agent name if not found
         return {
@@ -282,11 +261,7 @@ async def get_agent(request: Request, agent_req: GetAgentRequest = Body(...)):
             }
         }
     
-    print(f"✅ Agent found:")
-    print(f"   - _id: {agent.get('_id')}")
-    print(f"   - userId: {agent.get('userId')}")
-    print(f"   - agentName: {agent.get('agentName')}")
-    print("=" * 80)
+    logger.debug("✅ Agent found: %s", agent)
     
     return {
         "status": "success",
@@ -302,14 +277,12 @@ async def agent_conversation(request: Request, agent_req: AgentRequest = Body(..
     db = request.app.state.db
     user_id = agent_req.userId
     
-    print(f"🔔 Task reminder check for user: {user_id}")
+    logger.info("🔔 Task reminder check for user: %s", user_id)
     
     try:
         result = await check_and_send_task_reminders(db, user_id)
         return result
         
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file